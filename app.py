@@ -1,6 +1,9 @@
-from flask import Flask
+from flask import Flask, request, jsonify
 from flask_cors import CORS
 from auth.routes import init_oauth
+from assets import metrics, background, migrations, prewarm
+from auth import sweeper, outbox
+from link_organizer import compact, health
 import os
 
 app = Flask(__name__)
@@ -9,7 +12,11 @@ CORS(app, supports_credentials=True, origins=[
     "https://fedorco.dev",
     "https://www.fedorco.dev",
     "https://linkorganizer.fedorco.dev"
-])
+], expose_headers=["X-Next-Cursor"])
+
+# Bring every SQLite database up to the latest schema version
+if os.getenv("RUN_MIGRATIONS", "1") == "1":
+    migrations.migrate_all()
 
 # Initialize oAuth
 init_oauth(app)
@@ -34,5 +41,30 @@ app.register_blueprint(strava_api_bp, url_prefix="/stravaapi")
 from skolaonline_api.routes import skolaonline_api_bp  # Import your blueprint
 app.register_blueprint(skolaonline_api_bp, url_prefix="/skolaonlineapi")
 
+# Periodically purge expired sessions and abandoned signups
+background.start_periodic("expiry_sweeper", sweeper.SWEEP_INTERVAL_SEC, sweeper.sweep)
+
+# Deliver queued verification emails
+outbox.start()
+
+# Purge orphaned Link Organizer items and release free pages
+background.start_periodic("link_organizer_compaction", compact.COMPACT_INTERVAL_SEC, compact.compact, jitter=60)
+
+# Probe stored links for dead ones
+health.start()
+
+# Refresh the meal and timetable caches before their first callers (Europe/Prague wall-clock times)
+from strava_api import routes as strava_routes
+from skolaonline_api import routes as skolaonline_routes
+prewarm.schedule("strava_meals", strava_routes.PREWARM_TIMES, strava_routes.warm_cache, "strava_api")
+prewarm.schedule("skolaonline_classes", skolaonline_routes.PREWARM_TIMES, skolaonline_routes.warm_cache, "skolaonline_api")
+
+# Internal counters (caches, pools, ...) for monitoring, protected by the shared API key
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    if request.headers.get("x-api-key") != os.getenv("API_KEY"):
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(metrics.snapshot())
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,81 @@
+import multiprocessing, threading, logging, random, os
+
+logger = logging.getLogger(__name__)
+
+# name -> (fn, first_delay, next_delay); remembered so tasks can be restarted in forked workers
+_tasks = {}
+_threads = {}
+_wakeups = {}
+_stop = threading.Event()
+
+def _run(name, fn, first_delay, next_delay):
+    wakeup = _wakeups[name]
+    delay = first_delay()
+    while delay is not None:
+        wakeup.wait(delay)
+        if _stop.is_set():
+            break
+        wakeup.clear()
+        try:
+            fn()
+        except Exception:
+            logger.exception(f"Background task {name} failed")
+        delay = next_delay()
+
+def _in_multiprocessing_child():
+    # never run tasks inside multiprocessing helpers (e.g. the hashing pool); they re-import the
+    # main module before parent_process() is set, which multiprocessing marks with _inheriting
+    process = multiprocessing.current_process()
+    return multiprocessing.parent_process() is not None or getattr(process, "_inheriting", False)
+
+def _start(name, fn, first_delay, next_delay):
+    if _in_multiprocessing_child():
+        return False
+    _tasks[name] = (fn, first_delay, next_delay)
+    _wakeups.setdefault(name, threading.Event())
+    thread = _threads.get(name)
+    if thread and thread.is_alive():
+        return True
+    thread = threading.Thread(target=_run, args=(name, fn, first_delay, next_delay), name=f"bg-{name}", daemon=True)
+    _threads[name] = thread
+    thread.start()
+    return True
+
+def start_periodic(name, interval, fn, jitter=5):
+    """
+    Runs fn() every `interval` seconds in a daemon thread. An interval <= 0 disables the task.
+    Returns whether the task is running.
+    """
+    if interval <= 0:
+        return False
+    # small random offset so workers started together don't all fire at once
+    return _start(name, fn, lambda: random.uniform(0, jitter), lambda: interval)
+
+def start_scheduled(name, next_delay, fn):
+    """
+    Runs fn() in a daemon thread each time next_delay() seconds have passed; next_delay() is asked
+    again after every run and may return None to stop. Returns whether the task is running.
+    """
+    return _start(name, fn, next_delay, next_delay)
+
+def wake(name):
+    # run the task now instead of waiting for its next interval
+    wakeup = _wakeups.get(name)
+    if wakeup:
+        wakeup.set()
+
+def stop_all():
+    _stop.set()
+    for wakeup in _wakeups.values():
+        wakeup.set()
+
+def _restart_after_fork():
+    # threads do not survive fork (e.g. gunicorn --preload), so every worker restarts its own
+    global _stop
+    _stop = threading.Event()
+    _threads.clear()
+    _wakeups.clear()
+    for name, (fn, first_delay, next_delay) in _tasks.items():
+        _start(name, fn, first_delay, next_delay)
+
+os.register_at_fork(after_in_child=_restart_after_fork)
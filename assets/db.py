@@ -0,0 +1,139 @@
+import sqlite3, threading, time, os
+
+# Long-lived SQLite connections, one per (thread, database), reused across requests.
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DB_PATHS = {
+    "auth": os.path.join(BASE_DIR, "auth", "auth.db"),
+    "link_organizer": os.path.join(BASE_DIR, "link_organizer", "link_organizer.db"),
+    "strava_api": os.path.join(BASE_DIR, "strava_api", "strava_api_cache.db"),
+    "skolaonline_api": os.path.join(BASE_DIR, "skolaonline_api", "skolaonline_api_cache.db")
+}
+
+BUSY_TIMEOUT_SEC = 5
+CACHED_STATEMENTS = 256
+MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", str(16 * 1024)))
+# idle connections are pinged with SELECT 1 before reuse after this many seconds
+HEALTH_CHECK_INTERVAL = int(os.getenv("SQLITE_HEALTH_CHECK_INTERVAL", "30"))
+
+_local = threading.local()
+_lock = threading.Lock()
+# bumped after fork so that connections inherited from the parent are never reused
+_generation = 0
+# inherited connections are kept referenced (not closed) so the child never touches their locks
+_abandoned = []
+_stats = {"opened": 0, "checkouts": 0, "health_checks": 0, "reconnects": 0}
+# statement counting for benchmarks; only affects connections opened after it is enabled
+_count_queries = False
+_query_count = 0
+
+def _count(key):
+    with _lock:
+        _stats[key] += 1
+
+def _connect(db):
+    conn = sqlite3.connect(DB_PATHS[db], timeout=BUSY_TIMEOUT_SEC, cached_statements=CACHED_STATEMENTS)
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers proceed while a writer is active; NORMAL is durable across app crashes in WAL mode
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_SEC * 1000}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if _count_queries:
+        conn.set_trace_callback(_trace_query)
+    _count("opened")
+    return conn
+
+def _trace_query(statement):
+    global _query_count
+    with _lock:
+        _query_count += 1
+
+def enable_query_counting():
+    global _count_queries
+    _count_queries = True
+
+def query_count():
+    with _lock:
+        return _query_count
+
+def _is_healthy(conn):
+    _count("health_checks")
+    try:
+        conn.execute("SELECT 1").fetchone()
+        return True
+    except sqlite3.Error:
+        return False
+
+class PooledConnection:
+    """
+    Thin proxy around a pooled sqlite3 connection.
+    close() hands the connection back (rolling back anything uncommitted) instead of closing it,
+    so existing `finally: conn.close()` blocks keep working unchanged.
+    """
+    def __init__(self, db, conn):
+        self._db = db
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self._conn.__enter__()
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def close(self):
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+def get_conn(db):
+    if db not in DB_PATHS:
+        raise ValueError(f"Unknown database: {db}")
+    pool = getattr(_local, "conns", None)
+    if pool is None or getattr(_local, "generation", None) != _generation:
+        pool = _local.conns = {}
+        _local.generation = _generation
+
+    _count("checkouts")
+    entry = pool.get(db)
+    now = time.monotonic()
+    if entry is not None:
+        conn, last_used = entry
+        if now - last_used > HEALTH_CHECK_INTERVAL and not _is_healthy(conn):
+            _count("reconnects")
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+            entry = None
+    if entry is None:
+        conn = _connect(db)
+    pool[db] = (conn, now)
+    return PooledConnection(db, conn)
+
+def close_all():
+    # close this thread's connections (e.g. at worker shutdown)
+    pool = getattr(_local, "conns", None) or {}
+    for conn, _ in pool.values():
+        conn.close()
+    pool.clear()
+
+def _reset_after_fork():
+    global _generation, _lock
+    _lock = threading.Lock()
+    pool = getattr(_local, "conns", None)
+    if pool:
+        _abandoned.extend(conn for conn, _ in pool.values())
+    _generation += 1
+
+def stats():
+    with _lock:
+        return dict(_stats, generation=_generation)
+
+# gunicorn forks workers after the app has been imported (with --preload);
+# make sure no worker inherits its parent's open SQLite handles
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,21 +1,20 @@
 from flask import current_app, abort
 import sqlite3, time, re, os
-
-# Path to SQLite database file for auth
-BASE_DIR = os.path.dirname(os.path.dirname(__file__))  # goes from link_organizer/ to API/
-db_path_link_organizer = os.path.join(BASE_DIR, "link_organizer", "link_organizer.db")
-db_path_auth = os.path.join(BASE_DIR, "auth", "auth.db")
+from assets import session_cache, session_tokens, metrics, db as db_pool
 
 def get_db(db):
-    if db == "link_organizer":
-        db_path = db_path_link_organizer
-    elif db == "auth":
-        db_path = db_path_auth
-    conn = sqlite3.connect(db_path, timeout=5)
-    conn.row_factory = sqlite3.Row
-    return conn
+    # pooled per-thread connection; conn.close() returns it to the pool
+    return db_pool.get_conn(db)
 
 def validate_session(sid):
+    # signed stateless tokens are verified without touching the sessions table
+    if session_tokens.is_token(sid):
+        return session_tokens.verify(sid, lambda: get_db("auth"))
+
+    uid = session_cache.sessions.get(sid)
+    if uid is not None:
+        return uid
+
     conn = get_db("auth")
     try:
         c = conn.cursor()
@@ -25,15 +24,39 @@ def validate_session(sid):
             return False
         sid_expiry = session["expiry"]
 
+        # expired rows are purged by the background sweeper (auth/sweeper.py)
         time_now = int(time.time())
         if time_now > int(sid_expiry):
-            c.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
-            conn.commit()
             return False
         else:
-            return int(session["uid"])
+            uid = int(session["uid"])
+            cache_session(sid, uid, sid_expiry)
+            return uid
     except Exception as e:
         current_app.logger.info(f"DB error in handling SID validation: {e}")
         abort(500, description="DB error in handling SID validation.")
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+def cache_session(sid, uid, expiry):
+    # never keep a session in memory past its own expiry
+    session_cache.sessions.set(sid, int(uid), expires_at=int(expiry))
+
+def invalidate_session(sid):
+    session_cache.sessions.pop(sid)
+    if session_tokens.is_token(sid):
+        session_tokens.refresh(lambda: get_db("auth"))
+
+def invalidate_user_sessions(uid):
+    session_cache.sessions.pop_where(lambda cached_uid: cached_uid == int(uid))
+    invalidate_user_profile(uid)
+    # pick up the user-wide token revocation recorded by the caller
+    session_tokens.refresh(lambda: get_db("auth"))
+
+def invalidate_user_profile(uid):
+    session_cache.profiles.pop(int(uid))
+
+metrics.register("session_cache", session_cache.sessions.stats)
+metrics.register("profile_cache", session_cache.profiles.stats)
+metrics.register("db_pool", db_pool.stats)
+metrics.register("session_tokens", session_tokens.stats)
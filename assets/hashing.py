@@ -0,0 +1,138 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from assets import metrics
+import multiprocessing, threading, time, os, bcrypt
+
+# bcrypt runs in a dedicated process pool so a burst of logins cannot starve request workers.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# how many jobs may wait for a free hashing process before new ones are rejected
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", str(HASH_WORKERS * 4)))
+HASH_TIMEOUT_SEC = int(os.getenv("HASH_TIMEOUT_SEC", "10"))
+LATENCY_SAMPLES = 1000
+
+class HashingBusy(Exception):
+    """Raised when the hashing pool is saturated; callers should answer 503."""
+
+class HashingFailed(Exception):
+    """Raised when a job timed out or the pool broke; callers should log it and answer 503."""
+
+def _hashpw(secret, rounds):
+    return bcrypt.hashpw(secret, bcrypt.gensalt(rounds))
+
+def _checkpw(secret, hashed):
+    return bcrypt.checkpw(secret, hashed)
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_SIZE)
+_in_flight = 0
+_stats = {"completed": 0, "rejected": 0, "errors": 0}
+_latencies = deque(maxlen=LATENCY_SAMPLES)
+
+def _get_executor():
+    global _executor, _executor_pid
+    with _lock:
+        # a pool inherited through fork belongs to the parent; start a fresh one
+        if _executor is None or _executor_pid != os.getpid():
+            # forkserver children only preload this module, so they never re-run app.py or inherit its threads
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(["assets.hashing"])
+            _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=context)
+            _executor_pid = os.getpid()
+        return _executor
+
+def _release(future=None):
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+    _slots.release()
+
+def _discard_executor(executor):
+    # a broken pool rejects every later job; the next submit starts a fresh one
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+
+def _submit(fn, *args):
+    global _in_flight
+    if not _slots.acquire(blocking=False):
+        with _lock:
+            _stats["rejected"] += 1
+        raise HashingBusy("Hashing pool is saturated.")
+    with _lock:
+        _in_flight += 1
+    started = time.perf_counter()
+    try:
+        executor = _get_executor()
+        future = executor.submit(fn, *args)
+    except Exception as e:
+        _release()
+        with _lock:
+            _stats["errors"] += 1
+        if isinstance(e, BrokenProcessPool):
+            _discard_executor(executor)
+            raise HashingFailed("Hashing pool is broken.") from e
+        raise
+    # the slot belongs to the job, not the caller: a job that outlives HASH_TIMEOUT_SEC keeps its process busy
+    future.add_done_callback(_release)
+    try:
+        result = future.result(timeout=HASH_TIMEOUT_SEC)
+    except Exception as e:
+        with _lock:
+            _stats["errors"] += 1
+        if isinstance(e, FutureTimeout):
+            raise HashingFailed(f"Hashing took longer than {HASH_TIMEOUT_SEC}s.") from e
+        if isinstance(e, BrokenProcessPool):
+            _discard_executor(executor)
+            raise HashingFailed("Hashing pool is broken.") from e
+        raise
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with _lock:
+            _latencies.append(elapsed_ms)
+    with _lock:
+        _stats["completed"] += 1
+    return result
+
+def hash_secret(secret: str, rounds: int = None) -> str:
+    rounds = BCRYPT_ROUNDS if rounds is None else rounds
+    return _submit(_hashpw, secret.encode("utf-8"), rounds).decode("utf-8")
+
+def check_secret(secret: str, hashed: str) -> bool:
+    return _submit(_checkpw, secret.encode("utf-8"), hashed.encode("utf-8"))
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+
+def stats():
+    with _lock:
+        samples = list(_latencies)
+        in_flight = _in_flight
+        counters = dict(_stats)
+    return dict(
+        counters,
+        rounds=BCRYPT_ROUNDS,
+        workers=HASH_WORKERS,
+        queue_size=HASH_QUEUE_SIZE,
+        in_flight=in_flight,
+        queue_depth=max(0, in_flight - HASH_WORKERS),
+        latency_ms_p50=_percentile(samples, 50),
+        latency_ms_p95=_percentile(samples, 95),
+        latency_ms_max=round(max(samples), 2) if samples else 0.0
+    )
+
+def _reset_after_fork():
+    global _lock, _slots, _in_flight
+    _lock = threading.Lock()
+    _slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_SIZE)
+    _in_flight = 0
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+metrics.register("hashing", stats)
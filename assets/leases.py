@@ -0,0 +1,124 @@
+import threading, time, uuid, os
+
+# Named, expiring locks kept in a `leases` table (name, owner, expires) of whichever database the
+# caller passes a connection to, so gunicorn workers sharing that file can coordinate.
+ACQUIRE_QUERY = """
+    INSERT INTO leases (name, owner, expires) VALUES (:name, :owner, :expires)
+    ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires WHERE leases.expires <= :now
+"""
+
+class LeaseBusy(Exception):
+    """
+    Another worker kept the lease for longer than the caller was willing to wait.
+    """
+
+def acquire(conn, name, ttl):
+    """
+    Takes lease `name` for `ttl` seconds unless someone else holds an unexpired one. Commits on `conn`.
+    Returns the owner token to release with, or None.
+    """
+    now = time.time()
+    owner = uuid.uuid4().hex
+    c = conn.cursor()
+    c.execute(ACQUIRE_QUERY, {"name": name, "owner": owner, "expires": now + ttl, "now": now})
+    acquired = c.rowcount == 1
+    conn.commit()
+    return owner if acquired else None
+
+def release(conn, name, owner):
+    # only the holder may release; an expired lease already taken over by someone else is left alone
+    conn.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, owner))
+    conn.commit()
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    At most one call of fn() per key at a time. Threads of this worker asking for a key that is already
+    in flight wait for the leader and share its result (or exception); other workers are kept out by a
+    lease and poll `cached()` until the holder has stored the result, taking over if the lease expires.
+    """
+    def __init__(self, lease_ttl=30, poll_interval=0.2, wait_timeout=None):
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.wait_timeout = wait_timeout if wait_timeout is not None else lease_ttl + 5
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {"leader_runs": 0, "coalesced": 0, "lease_waits": 0, "timeouts": 0}
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def do(self, conn, key, fn, cached):
+        """
+        Returns cached() if it already has a value, otherwise fn(). `conn` is used for the lease and
+        must be on the database that holds both the `leases` table and what `cached()` reads.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            self._count("coalesced")
+            if not call.done.wait(self.wait_timeout):
+                self._count("timeouts")
+                raise LeaseBusy(key)
+            if call.error:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_leased(conn, key, fn, cached)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def _run_leased(self, conn, key, fn, cached):
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        while True:
+            owner = acquire(conn, key, self.lease_ttl)
+            if owner:
+                try:
+                    # a previous holder may have stored the result just before releasing
+                    result = cached()
+                    if result is None:
+                        self._count("leader_runs")
+                        result = fn()
+                    return result
+                except Exception:
+                    # never let release() commit a half-done write
+                    conn.rollback()
+                    raise
+                finally:
+                    release(conn, key, owner)
+            if not waited:
+                self._count("lease_waits")
+                waited = True
+            result = cached()
+            if result is not None:
+                return result
+            if time.monotonic() >= deadline:
+                self._count("timeouts")
+                raise LeaseBusy(key)
+            time.sleep(self.poll_interval)
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls))
@@ -0,0 +1,14 @@
+import threading
+
+# name -> zero-argument callable returning a JSON-serializable dict
+_providers = {}
+_lock = threading.Lock()
+
+def register(name, provider):
+    with _lock:
+        _providers[name] = provider
+
+def snapshot():
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in providers.items()}
@@ -0,0 +1,74 @@
+import sqlite3, importlib, logging
+from assets import db as db_pool
+
+logger = logging.getLogger(__name__)
+
+# database name (see assets/db.py) -> module holding its MIGRATIONS list
+MIGRATION_MODULES = {
+    "auth": "auth.migrations",
+    "link_organizer": "link_organizer.migrations",
+    "strava_api": "strava_api.migrations",
+    "skolaonline_api": "skolaonline_api.migrations"
+}
+
+class Migration:
+    """
+    One numbered schema step. `steps` is a list of SQL statements and/or callables taking the connection.
+    Transactional migrations run inside BEGIN IMMEDIATE together with the user_version bump;
+    set transactional=False for statements SQLite refuses to run in a transaction (e.g. VACUUM).
+    """
+    def __init__(self, version, description, steps, transactional=True):
+        self.version = version
+        self.description = description
+        self.steps = steps
+        self.transactional = transactional
+
+    def apply(self, conn):
+        for step in self.steps:
+            if callable(step):
+                step(conn)
+            else:
+                conn.execute(step)
+
+def get_migrations(db):
+    return importlib.import_module(MIGRATION_MODULES[db]).MIGRATIONS
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(db, path=None):
+    """
+    Applies every migration of `db` newer than its PRAGMA user_version. Safe to run from several
+    workers at once: the version is re-read after taking the write lock. Returns the applied versions.
+    """
+    migrations = sorted(get_migrations(db), key=lambda m: m.version)
+    conn = sqlite3.connect(path or db_pool.DB_PATHS[db], timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    applied = []
+    try:
+        for migration in migrations:
+            if migration.version <= schema_version(conn):
+                continue
+            if migration.transactional:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    if migration.version <= schema_version(conn):
+                        conn.execute("ROLLBACK")
+                        continue
+                    migration.apply(conn)
+                    conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            else:
+                migration.apply(conn)
+                conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+            applied.append(migration.version)
+            logger.info(f"Applied {db} migration {migration.version}: {migration.description}")
+    finally:
+        conn.close()
+    return applied
+
+def migrate_all():
+    return {db: migrate(db) for db in MIGRATION_MODULES}
@@ -0,0 +1,117 @@
+from assets import global_modules, background, leases, metrics
+from datetime import datetime, timedelta, time as Time
+from zoneinfo import ZoneInfo
+import random, time, os, logging
+
+logger = logging.getLogger(__name__)
+
+# Upstream caches are refreshed at fixed wall-clock times so the first caller of the day (or of the
+# next lesson) finds them warm. Every worker schedules the jobs; a lease lets only one of them run each slot.
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "1") == "1"
+PREWARM_TZ = ZoneInfo(os.getenv("PREWARM_TZ", "Europe/Prague"))
+# weekdays to run on, Monday = 0
+PREWARM_DAYS = tuple(int(day) for day in os.getenv("PREWARM_DAYS", "0,1,2,3,4").split(","))
+PREWARM_JITTER_SEC = int(os.getenv("PREWARM_JITTER_SEC", "60"))
+PREWARM_RETRIES = int(os.getenv("PREWARM_RETRIES", "3"))
+PREWARM_RETRY_DELAY_SEC = int(os.getenv("PREWARM_RETRY_DELAY_SEC", "30"))
+# each slot has its own lease, kept after a successful run so workers firing later in the jitter window
+# skip it; must exceed the jitter plus all retries
+PREWARM_LEASE_SEC = int(os.getenv("PREWARM_LEASE_SEC", "600"))
+
+STATUS_QUERY = """
+    INSERT INTO prewarm_status (job, last_success, last_failure, last_error) VALUES (:job, :success, :failure, :error)
+    ON CONFLICT (job) DO UPDATE SET last_success = coalesce(excluded.last_success, last_success),
+        last_failure = coalesce(excluded.last_failure, last_failure), last_error = coalesce(excluded.last_error, last_error)
+"""
+# leases of past slots; a range on the primary key instead of LIKE, ";" being the character after ":"
+PURGE_LEASES_QUERY = "DELETE FROM leases WHERE name >= :prefix || ':' AND name < :prefix || ';' AND expires <= :now"
+
+# job name -> database holding its lease and status
+_jobs = {}
+
+def parse_times(spec):
+    """
+    "05:30, 7:55" -> sorted datetime.time list.
+    """
+    return sorted({Time.fromisoformat(part.strip().zfill(5)) for part in spec.split(",") if part.strip()})
+
+def next_run(times, days=PREWARM_DAYS, now=None):
+    """
+    The next of `times` (wall clock in PREWARM_TZ) on one of `days` after `now`, or None.
+    """
+    now = now or datetime.now(PREWARM_TZ)
+    for offset in range(8):
+        day = now.date() + timedelta(days=offset)
+        if day.weekday() not in days:
+            continue
+        for at in times:
+            candidate = datetime.combine(day, at, tzinfo=PREWARM_TZ)
+            if candidate > now:
+                return candidate
+    return None
+
+def _record(conn, job, success=None, failure=None, error=None):
+    conn.execute(STATUS_QUERY, {"job": job, "success": success, "failure": failure, "error": error})
+    conn.commit()
+
+def run_job(job, fn, db, slot):
+    """
+    The `slot` (datetime) run of `job`: takes the slot's lease, then runs fn(conn) with up to PREWARM_RETRIES
+    retries and exponential backoff. Returns whether the cache was refreshed by this worker.
+    """
+    name = f"prewarm:{job}:{slot.isoformat()}"
+    conn = global_modules.get_db(db)
+    try:
+        conn.execute(PURGE_LEASES_QUERY, {"prefix": f"prewarm:{job}", "now": time.time()})
+        conn.commit()
+        owner = leases.acquire(conn, name, PREWARM_LEASE_SEC)
+        if not owner:
+            return False
+        for attempt in range(PREWARM_RETRIES + 1):
+            try:
+                fn(conn)
+                _record(conn, job, success=time.time())
+                return True
+            except Exception as e:
+                conn.rollback()
+                logger.warning(f"Prewarm {job} failed (attempt {attempt + 1}): {e}")
+                _record(conn, job, failure=time.time(), error=str(e)[:500])
+                if attempt < PREWARM_RETRIES:
+                    time.sleep(PREWARM_RETRY_DELAY_SEC * 2 ** attempt)
+        # give a worker whose slot fires later the chance to try
+        leases.release(conn, name, owner)
+        return False
+    finally:
+        conn.close()
+
+def schedule(job, times, fn, db, days=PREWARM_DAYS):
+    """
+    Runs fn(conn) (a connection to `db`, which needs the leases and prewarm_status tables) at each of
+    `times` ("05:30,07:55", PREWARM_TZ wall clock) on `days`. Returns whether the job is scheduled.
+    """
+    times = parse_times(times)
+    if not PREWARM_ENABLED or not times:
+        return False
+    _jobs[job] = db
+    # the slot the task thread is waiting for; every worker computes the same one, so they share its lease
+    pending = {}
+
+    def next_delay():
+        at = pending["slot"] = next_run(times, days)
+        return max(at.timestamp() - time.time(), 0) + random.uniform(0, PREWARM_JITTER_SEC) if at else None
+
+    return background.start_scheduled(f"prewarm_{job}", next_delay, lambda: run_job(job, fn, db, pending["slot"]))
+
+def stats():
+    result = {}
+    for job, db in _jobs.items():
+        conn = global_modules.get_db(db)
+        try:
+            row = conn.execute("SELECT last_success, last_failure, last_error FROM prewarm_status WHERE job = ?", (job,)).fetchone()
+        finally:
+            conn.close()
+        result[job] = dict(row) if row else {"last_success": None, "last_failure": None, "last_error": None}
+        result[job]["last_success_age_sec"] = round(time.time() - row["last_success"]) if row and row["last_success"] else None
+    return result
+
+metrics.register("prewarm", stats)
@@ -0,0 +1,137 @@
+"""
+EXPLAIN QUERY PLAN report for every literal SQL statement the app issues.
+
+Statements are collected from `.execute(...)` / `.executemany(...)` calls in the source tree,
+planned against freshly migrated temporary databases, and any full table scan is flagged.
+
+    python -m assets.query_plan_report           # human-readable report, exit code 1 on full scans
+    python -m assets.query_plan_report --json    # machine-readable report for CI
+"""
+import ast, json, os, re, sqlite3, sys, tempfile
+from assets import migrations
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SKIP_DIRS = {".git", "__pycache__", "venv", ".venv", "benchmarks"}
+SKIP_FILES = {"migrations.py", "initialize_db.py", "query_plan_report.py"}
+
+# statements built with f-strings cannot be read from the source; list their concrete forms here
+EXTRA_QUERIES = [
+    ("auth/sweeper.py", f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE expiry < ? LIMIT ?)")
+    for table in ("sessions", "temp_users", "email_outbox", "session_revocations", "rate_limits")
+]
+
+# "SCAN <table or alias>" with no index at all; scans of an index, a CTE or a subquery are fine
+_FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_NAMED_PARAM = re.compile(r"(?<![:\w]):(\w+)")
+
+def collect_queries(base_dir=BASE_DIR):
+    queries = []
+    for root, dirs, files in os.walk(base_dir):
+        dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in files:
+            if not name.endswith(".py") or name in SKIP_FILES:
+                continue
+            path = os.path.join(root, name)
+            with open(path, encoding="utf-8") as f:
+                tree = ast.parse(f.read(), filename=path)
+            # module-level SQL constants, e.g. TREE_QUERY = "WITH RECURSIVE ..."
+            constants = {
+                target.id: node.value.value
+                for node in tree.body if isinstance(node, ast.Assign)
+                and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+                for target in node.targets if isinstance(target, ast.Name)
+            }
+            for node in ast.walk(tree):
+                if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                        and node.func.attr in ("execute", "executemany") and node.args):
+                    continue
+                arg = node.args[0]
+                if isinstance(arg, ast.Constant) and isinstance(arg.value, str):
+                    sql = arg.value
+                elif isinstance(arg, ast.Name) and arg.id in constants:
+                    sql = constants[arg.id]
+                else:
+                    continue
+                sql = " ".join(sql.split())
+                if sql.upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")):
+                    queries.append((f"{os.path.relpath(path, base_dir)}:{node.lineno}", sql))
+    queries.extend((location, " ".join(sql.split())) for location, sql in EXTRA_QUERIES)
+    return queries
+
+def _params(sql):
+    names = _NAMED_PARAM.findall(sql)
+    if names:
+        return {name: None for name in names}
+    return (None,) * sql.count("?")
+
+def full_scans(conn, sql, plan):
+    # maintenance queries that scan on purpose are marked with /* allow-full-scan */
+    if "allow-full-scan" in sql:
+        return []
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in ("WHERE", "ON", "JOIN", "LEFT", "INNER", "ORDER", "GROUP", "LIMIT", "USING"):
+            aliases[alias] = table
+    scans = []
+    for detail in plan:
+        match = _FULL_SCAN.match(detail)
+        if match and aliases.get(match.group(1), match.group(1)) in tables:
+            scans.append(detail)
+    return scans
+
+def explain(conns, sql):
+    """
+    Plans `sql` against the first database that knows its tables. Returns (db, [plan details]).
+    """
+    last_error = None
+    for db, conn in conns.items():
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", _params(sql)).fetchall()
+            return db, [row[3] for row in rows]
+        except sqlite3.OperationalError as e:
+            last_error = e
+    raise sqlite3.OperationalError(f"{last_error} in: {sql}")
+
+def build_report(base_dir=BASE_DIR):
+    with tempfile.TemporaryDirectory() as tmp:
+        conns = {}
+        for db in migrations.MIGRATION_MODULES:
+            path = os.path.join(tmp, f"{db}.db")
+            migrations.migrate(db, path)
+            conns[db] = sqlite3.connect(path)
+        try:
+            report = []
+            for location, sql in collect_queries(base_dir):
+                try:
+                    db, plan = explain(conns, sql)
+                    report.append({"location": location, "db": db, "sql": sql, "plan": plan, "full_scans": full_scans(conns[db], sql, plan)})
+                except sqlite3.OperationalError as e:
+                    report.append({"location": location, "db": None, "sql": sql, "plan": [], "full_scans": [], "error": str(e)})
+            return report
+        finally:
+            for conn in conns.values():
+                conn.close()
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    report = build_report()
+    problems = [entry for entry in report if entry["full_scans"] or entry.get("error")]
+    if "--json" in argv:
+        print(json.dumps({"queries": report, "problems": len(problems)}, indent=2, ensure_ascii=False))
+    else:
+        for entry in report:
+            status = "FULL SCAN" if entry["full_scans"] else ("ERROR" if entry.get("error") else "ok")
+            print(f"[{status}] {entry['location']} ({entry['db']})")
+            print(f"    {entry['sql']}")
+            for detail in entry["plan"]:
+                print(f"      -> {detail}")
+            if entry.get("error"):
+                print(f"      !! {entry['error']}")
+        print(f"\n{len(report)} queries, {len(problems)} with problems.")
+    return 1 if problems else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+from flask import request, jsonify, make_response
+from collections import OrderedDict
+from functools import wraps
+from assets import metrics
+import threading, math, time, os
+
+# Token buckets per endpoint: "<burst>/<seconds>" = up to <burst> requests, refilled at <burst> per <seconds>.
+# Override with e.g. RATE_LIMIT_LOGIN="20/60".
+DEFAULT_LIMITS = {
+    "login": "10/60",
+    "signup": "5/300",
+    "verify_code": "10/300"
+}
+# buckets kept in memory per worker before the least recently used are evicted
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "50000"))
+# keep buckets in auth.db so all workers agree (costs one write per check)
+RATE_LIMIT_SHARED = os.getenv("RATE_LIMIT_SHARED", "0") == "1"
+# number of reverse proxies in front of the app whose X-Forwarded-For entries can be trusted
+TRUSTED_PROXIES = int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "0"))
+
+def parse_limit(spec):
+    burst, seconds = spec.split("/")
+    burst = float(burst)
+    return burst, burst / float(seconds)
+
+def get_limit(endpoint):
+    return parse_limit(os.getenv(f"RATE_LIMIT_{endpoint.upper()}", DEFAULT_LIMITS[endpoint]))
+
+class TokenBucketLimiter:
+    """
+    In-memory token buckets keyed by arbitrary strings. Each bucket is a [tokens, updated] pair;
+    the least recently used buckets are evicted beyond `max_keys` (an evicted bucket is simply full again).
+    """
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self.evictions = 0
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, burst, rate, now=None):
+        """
+        Takes one token. Returns 0 when allowed, otherwise the seconds until a token is available.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+    def size(self):
+        with self._lock:
+            return len(self._buckets)
+
+def consume_shared(conn, key, burst, rate, now=None):
+    """
+    Same contract as TokenBucketLimiter.consume, but the bucket lives in the rate_limits table.
+    A single UPSERT refills and takes a token atomically; its WHERE clause skips the update when empty.
+    """
+    now = time.time() if now is None else now
+    c = conn.cursor()
+    c.execute("""
+        INSERT INTO rate_limits (key, tokens, updated, expiry) VALUES (:key, :burst - 1, :now, :now + 1.0 / :rate)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:burst, tokens + (:now - updated) * :rate) - 1,
+            updated = :now,
+            expiry = :now + (:burst - min(:burst, tokens + (:now - updated) * :rate) + 1) / :rate
+        WHERE min(:burst, tokens + (:now - updated) * :rate) >= 1
+    """, {"key": key, "burst": burst, "rate": rate, "now": now})
+    allowed = c.rowcount == 1
+    if allowed:
+        conn.commit()
+        return 0
+    row = c.execute("SELECT tokens, updated FROM rate_limits WHERE key = ?", (key,)).fetchone()
+    conn.commit()
+    tokens = min(burst, row["tokens"] + (now - row["updated"]) * rate) if row else 0
+    return max(0.0, (1 - tokens) / rate)
+
+limiter = TokenBucketLimiter()
+_lock = threading.Lock()
+_counters = {}
+
+def _count(endpoint, outcome):
+    with _lock:
+        endpoint_counters = _counters.setdefault(endpoint, {"allowed": 0, "rejected_ip": 0, "rejected_identity": 0})
+        endpoint_counters[outcome] += 1
+
+def client_ip():
+    route = request.access_route if TRUSTED_PROXIES else [request.remote_addr]
+    if TRUSTED_PROXIES and len(route) >= TRUSTED_PROXIES:
+        return route[-TRUSTED_PROXIES]
+    return route[0] if route and route[0] else "unknown"
+
+def normalize_email(raw):
+    return raw.strip().lower() if isinstance(raw, str) and raw.strip() else None
+
+def check(endpoint, key, get_conn=None):
+    burst, rate = get_limit(endpoint)
+    key = f"{endpoint}:{key}"
+    if RATE_LIMIT_SHARED and get_conn:
+        conn = get_conn()
+        try:
+            return consume_shared(conn, key, burst, rate)
+        finally:
+            conn.close()
+    return limiter.consume(key, burst, rate)
+
+def rate_limited(endpoint, identity=None, get_conn=None):
+    """
+    Rejects a request with 429 before the view runs (so before any hashing or DB work) when the client IP,
+    or the identity returned by `identity()` (e.g. the normalized email), has used up its bucket.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            retry_after = check(endpoint, f"ip:{client_ip()}", get_conn)
+            outcome = "rejected_ip"
+            if not retry_after and identity:
+                identity_key = identity()
+                if identity_key:
+                    retry_after = check(endpoint, f"id:{identity_key}", get_conn)
+                    outcome = "rejected_identity"
+            if retry_after:
+                _count(endpoint, outcome)
+                response = make_response(jsonify({"error": "Too many requests, please try again later."}), 429)
+                response.headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+                return response
+            _count(endpoint, "allowed")
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+def stats():
+    with _lock:
+        counters = {endpoint: dict(c) for endpoint, c in _counters.items()}
+    return {
+        "shared": RATE_LIMIT_SHARED,
+        "limits": {endpoint: os.getenv(f"RATE_LIMIT_{endpoint.upper()}", spec) for endpoint, spec in DEFAULT_LIMITS.items()},
+        "buckets": limiter.size(),
+        "evictions": limiter.evictions,
+        "endpoints": counters
+    }
+
+metrics.register("rate_limit", stats)
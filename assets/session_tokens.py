@@ -0,0 +1,139 @@
+from dotenv import load_dotenv
+import hmac, hashlib, base64, secrets, threading, time, os
+
+load_dotenv(override=True)
+
+# Opt-in stateless sessions: "v1.<uid>.<issued_ms>.<expiry>.<jti>.<signature>", HMAC-SHA256 signed with
+# FLASK_SECRET_KEY, so validating one needs no DB access. Plain 64-hex sids keep working side by side.
+STATELESS_SESSIONS = os.getenv("STATELESS_SESSIONS", "0") == "1"
+# keep accepting already issued tokens without issuing new ones, e.g. while switching back to DB sessions
+ACCEPT_STATELESS_SESSIONS = STATELESS_SESSIONS or os.getenv("ACCEPT_STATELESS_SESSIONS", "0") == "1"
+TOKEN_PREFIX = "v1."
+SECRET_KEY = os.getenv("FLASK_SECRET_KEY")
+if ACCEPT_STATELESS_SESSIONS and not SECRET_KEY:
+    raise ValueError("FLASK_SECRET_KEY is required when STATELESS_SESSIONS or ACCEPT_STATELESS_SESSIONS is enabled")
+
+# how often each worker pulls new rows from session_revocations
+REVOCATION_RELOAD_SEC = float(os.getenv("REVOCATION_RELOAD_SEC", "2"))
+# the longest session we issue; a user-wide revocation is pointless after that
+MAX_SESSION_LIFESPAN = 30 * 24 * 60 * 60
+
+_lock = threading.Lock()
+_revoked_jtis = {}      # jti -> token expiry
+_revoked_before = {}    # uid -> (issued_ms cutoff, entry expiry)
+_last_id = 0
+_last_reload = 0.0
+_stats = {"verified": 0, "rejected": 0, "reloads": 0}
+
+def _sign(payload):
+    if not SECRET_KEY:
+        raise RuntimeError("Session tokens cannot be signed without FLASK_SECRET_KEY")
+    digest = hmac.new(SECRET_KEY.encode("utf-8"), payload.encode("utf-8"), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode("ascii")
+
+def is_token(sid):
+    # while tokens are not accepted a "v1." sid is just an unknown sid, looked up (and not found) in the sessions table
+    return ACCEPT_STATELESS_SESSIONS and isinstance(sid, str) and sid.startswith(TOKEN_PREFIX)
+
+def issue(uid, expiry):
+    payload = f"{TOKEN_PREFIX}{int(uid)}.{int(time.time() * 1000)}.{int(expiry)}.{secrets.token_hex(8)}"
+    return f"{payload}.{_sign(payload)}"
+
+def parse(token):
+    """
+    Returns (uid, issued_ms, expiry, jti) for a well-formed, correctly signed token, otherwise None.
+    Expiry and revocation are not checked here.
+    """
+    if not is_token(token):
+        return None
+    payload, _, signature = token.rpartition(".")
+    if not hmac.compare_digest(_sign(payload), signature):
+        return None
+    try:
+        uid, issued_ms, expiry, jti = payload[len(TOKEN_PREFIX):].split(".")
+        return int(uid), int(issued_ms), int(expiry), jti
+    except ValueError:
+        return None
+
+def verify(token, conn_factory):
+    """
+    Returns the uid of a valid, unexpired and unrevoked token, otherwise False.
+    `conn_factory` is only called when the revocation set is due for a reload.
+    """
+    parsed = parse(token)
+    if parsed and time.time() <= parsed[2]:
+        _maybe_reload(conn_factory)
+        uid, issued_ms, _, jti = parsed
+        with _lock:
+            cutoff = _revoked_before.get(uid)
+            revoked = jti in _revoked_jtis or (cutoff is not None and issued_ms <= cutoff[0])
+            _stats["rejected" if revoked else "verified"] += 1
+        return False if revoked else uid
+    with _lock:
+        _stats["rejected"] += 1
+    return False
+
+def revoke_token(c, token):
+    # records the revocation with the caller's cursor; call refresh() after the commit
+    parsed = parse(token)
+    if not parsed:
+        return False
+    _, _, expiry, jti = parsed
+    c.execute("INSERT INTO session_revocations (jti, expiry) VALUES (?, ?)", (jti, expiry))
+    return True
+
+def revoke_user(c, uid):
+    # invalidates every token of `uid` issued up to now
+    now = time.time()
+    c.execute(
+        "INSERT INTO session_revocations (uid, revoked_before, expiry) VALUES (?, ?, ?)",
+        (int(uid), int(now * 1000), int(now) + MAX_SESSION_LIFESPAN)
+    )
+
+def _maybe_reload(conn_factory):
+    if time.monotonic() - _last_reload >= REVOCATION_RELOAD_SEC:
+        refresh(conn_factory)
+
+def refresh(conn_factory):
+    """
+    Pulls revocations newer than the last one seen (incremental, by id) and forgets expired ones.
+    """
+    global _last_id, _last_reload
+    conn = conn_factory()
+    try:
+        with _lock:
+            last_id = _last_id
+        rows = conn.execute(
+            "SELECT id, jti, uid, revoked_before, expiry FROM session_revocations WHERE id > ? ORDER BY id",
+            (last_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    now = int(time.time())
+    with _lock:
+        for row in rows:
+            if row["jti"]:
+                _revoked_jtis[row["jti"]] = row["expiry"]
+            elif row["uid"] is not None:
+                previous = _revoked_before.get(row["uid"])
+                if not previous or previous[0] < row["revoked_before"]:
+                    _revoked_before[row["uid"]] = (row["revoked_before"], row["expiry"])
+            _last_id = max(_last_id, row["id"])
+        for jti in [j for j, expiry in _revoked_jtis.items() if expiry < now]:
+            del _revoked_jtis[jti]
+        for uid in [u for u, (_, expiry) in _revoked_before.items() if expiry < now]:
+            del _revoked_before[uid]
+        _last_reload = time.monotonic()
+        _stats["reloads"] += 1
+
+def stats():
+    with _lock:
+        return dict(
+            _stats,
+            enabled=STATELESS_SESSIONS,
+            accepted=ACCEPT_STATELESS_SESSIONS,
+            revoked_tokens=len(_revoked_jtis),
+            revoked_users=len(_revoked_before),
+            last_revocation_id=_last_id
+        )
@@ -1,43 +1,11 @@
-import sqlite3
+import sys
 import os
 
-db_path = os.path.join(os.path.dirname(__file__), "auth.db")
+# allow running as a plain script: python auth/initialize_db.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-conn = sqlite3.connect(db_path)
-c = conn.cursor()
+from assets.migrations import migrate
 
-# CREATE USERS TABLE
-c.execute("""
-    CREATE TABLE IF NOT EXISTS users (
-        uid INTEGER PRIMARY KEY AUTOINCREMENT,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT,
-        google_id TEXT UNIQUE
-    )
-""")
+applied = migrate("auth")
 
-# CREATE SESSIONS TABLE
-c.execute("""
-    CREATE TABLE IF NOT EXISTS sessions (
-        sid TEXT PRIMARY KEY,
-        uid INTEGER NOT NULL,
-        expiry INTEGER NOT NULL
-    )
-""")
-
-# CREATE TEMPORARY USER TABLE
-c.execute("""
-    CREATE TABLE IF NOT EXISTS temp_users (
-        token TEXT PRIMARY KEY,
-        email TEXT UNIQUE NOT NULL,
-        password TEXT NOT NULL,
-        code TEXT NOT NULL,
-        expiry INTEGER NOT NULL,
-        attempts INTEGER  DEFAULT 0
-    )
-""")
-
-conn.commit()
-conn.close()
-
-print("Auth DB initialized.")
\ No newline at end of file
+print(f"Auth DB initialized (applied migrations: {applied or 'none'}).")
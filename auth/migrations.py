@@ -0,0 +1,76 @@
+from assets.migrations import Migration
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            uid INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT,
+            google_id TEXT UNIQUE
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS sessions (
+            sid TEXT PRIMARY KEY,
+            uid INTEGER NOT NULL,
+            expiry INTEGER NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS temp_users (
+            token TEXT PRIMARY KEY,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            code TEXT NOT NULL,
+            expiry INTEGER NOT NULL,
+            attempts INTEGER  DEFAULT 0
+        )
+        """,
+        # delivered asynchronously by auth/outbox.py
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            html TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt INTEGER NOT NULL,
+            expiry INTEGER NOT NULL,
+            sent_at INTEGER,
+            last_error TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_pending ON email_outbox (next_attempt) WHERE status = 'pending'",
+        # signed stateless session tokens: either a single token (jti) or every token of a user issued up to revoked_before (ms)
+        """
+        CREATE TABLE IF NOT EXISTS session_revocations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            jti TEXT,
+            uid INTEGER,
+            revoked_before INTEGER,
+            expiry INTEGER NOT NULL
+        )
+        """,
+        # shared token buckets, used with RATE_LIMIT_SHARED=1
+        """
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            expiry REAL NOT NULL
+        )
+        """,
+        # expiry sweeper
+        "CREATE INDEX IF NOT EXISTS idx_sessions_expiry ON sessions (expiry)",
+        "CREATE INDEX IF NOT EXISTS idx_temp_users_expiry ON temp_users (expiry)",
+        "CREATE INDEX IF NOT EXISTS idx_email_outbox_expiry ON email_outbox (expiry)",
+        "CREATE INDEX IF NOT EXISTS idx_session_revocations_expiry ON session_revocations (expiry)",
+        "CREATE INDEX IF NOT EXISTS idx_rate_limits_expiry ON rate_limits (expiry)"
+    ]),
+    Migration(2, "index sessions by uid", [
+        # DELETE FROM sessions WHERE uid = ? on password change / account deletion
+        "CREATE INDEX IF NOT EXISTS idx_sessions_uid ON sessions (uid)"
+    ])
+]
@@ -0,0 +1,161 @@
+from assets import global_modules, background, metrics
+from requests.adapters import HTTPAdapter
+import requests, random, time, os, logging, threading
+
+logger = logging.getLogger(__name__)
+
+# Verification emails are written to the email_outbox table in the same transaction as the
+# signup itself and delivered by a background dispatcher, so the request never waits on Brevo.
+BREVO_API_URL = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
+SENDER = {"name": "fedorco.dev", "email": "noreply@fedorco.dev"}
+
+OUTBOX_POLL_SEC = int(os.getenv("OUTBOX_POLL_SEC", "5"))
+OUTBOX_BATCH_SIZE = 20
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+BACKOFF_BASE_SEC = 2
+BACKOFF_MAX_SEC = 60
+# (connect, read) timeouts for the Brevo API
+SEND_TIMEOUT = (3.05, 10)
+# a claimed row is invisible to other workers for this long
+CLAIM_LEASE_SEC = 30
+
+TASK_NAME = "email_outbox"
+
+def enqueue(c, recipient, subject, html, expiry):
+    """
+    Queues an email using the caller's cursor; it is sent only once the caller commits.
+    `expiry` is when the email becomes pointless (e.g. the code inside it expires).
+    """
+    c.execute(
+        "INSERT INTO email_outbox (recipient, subject, html, next_attempt, expiry) VALUES (?, ?, ?, ?, ?)",
+        (recipient, subject, html, int(time.time()), expiry)
+    )
+
+def notify():
+    # wake this worker's dispatcher right after a commit instead of waiting for the next poll
+    background.wake(TASK_NAME)
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE_SEC * 2 ** attempts, BACKOFF_MAX_SEC)
+    return delay + random.uniform(0, delay / 2)
+
+class OutboxDispatcher:
+    """
+    Delivers pending outbox rows over one pooled, keep-alive HTTP session.
+    `api_url` can point at a local stand-in server in tests.
+    """
+    def __init__(self, api_url=BREVO_API_URL, api_key=None, session=None):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.session = session or self._make_session()
+        self._lock = threading.Lock()
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "last_run": None}
+
+    @staticmethod
+    def _make_session():
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+        return session
+
+    def _claim(self, c, now):
+        c.execute(
+            "SELECT id, next_attempt FROM email_outbox WHERE status = 'pending' AND next_attempt <= ? ORDER BY next_attempt LIMIT ?",
+            (now, OUTBOX_BATCH_SIZE)
+        )
+        claimed = []
+        for row in c.fetchall():
+            # compare-and-set so that only one worker takes a given row
+            c.execute(
+                "UPDATE email_outbox SET next_attempt = ? WHERE id = ? AND status = 'pending' AND next_attempt = ?",
+                (now + CLAIM_LEASE_SEC, row["id"], row["next_attempt"])
+            )
+            if c.rowcount == 1:
+                claimed.append(row["id"])
+        return claimed
+
+    def _send(self, row):
+        response = self.session.post(
+            self.api_url,
+            headers={"api-key": self.api_key or os.getenv("BREVO_API_KEY") or ""},
+            json={
+                "sender": SENDER,
+                "to": [{"email": row["recipient"]}],
+                "subject": row["subject"],
+                "htmlContent": row["html"]
+            },
+            timeout=SEND_TIMEOUT
+        )
+        return response.status_code, response.text[:500]
+
+    def run_once(self):
+        """
+        Sends every due email once. Returns a dict with the number of sent / retried / failed rows.
+        """
+        result = {"sent": 0, "retried": 0, "failed": 0}
+        conn = global_modules.get_db("auth")
+        try:
+            c = conn.cursor()
+            now = int(time.time())
+            ids = self._claim(c, now)
+            conn.commit()
+
+            for email_id in ids:
+                row = c.execute("SELECT * FROM email_outbox WHERE id = ?", (email_id,)).fetchone()
+                if not row:
+                    continue
+                now = int(time.time())
+                if now > row["expiry"]:
+                    c.execute("UPDATE email_outbox SET status = 'failed', html = '', last_error = ? WHERE id = ?", ("Expired before delivery.", email_id))
+                    conn.commit()
+                    result["failed"] += 1
+                    continue
+
+                # no DB transaction is held open while talking to Brevo
+                try:
+                    status_code, text = self._send(row)
+                    error = None if status_code < 400 else f"HTTP {status_code}: {text}"
+                    retryable = status_code == 429 or status_code >= 500
+                except requests.RequestException as e:
+                    error = f"{type(e).__name__}: {e}"
+                    retryable = True
+
+                attempts = row["attempts"] + 1
+                if error is None:
+                    # the message carries a one-time code - don't keep it around once delivered
+                    c.execute("UPDATE email_outbox SET status = 'sent', html = '', attempts = ?, sent_at = ?, last_error = NULL WHERE id = ?", (attempts, now, email_id))
+                    result["sent"] += 1
+                elif retryable and attempts < OUTBOX_MAX_ATTEMPTS:
+                    c.execute("UPDATE email_outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE id = ?", (attempts, now + int(backoff_delay(attempts)), error, email_id))
+                    result["retried"] += 1
+                else:
+                    c.execute("UPDATE email_outbox SET status = 'failed', html = '', attempts = ?, last_error = ? WHERE id = ?", (attempts, error, email_id))
+                    result["failed"] += 1
+                    logger.warning(f"Giving up on outbox email {email_id}: {error}")
+                conn.commit()
+        finally:
+            conn.close()
+
+        with self._lock:
+            for key, count in result.items():
+                self.stats[key] += count
+            self.stats["last_run"] = int(time.time())
+        return result
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+dispatcher = OutboxDispatcher()
+
+def pending_count():
+    conn = global_modules.get_db("auth")
+    try:
+        return conn.execute("SELECT COUNT(*) FROM email_outbox WHERE status = 'pending'").fetchone()[0]
+    finally:
+        conn.close()
+
+def start():
+    return background.start_periodic(TASK_NAME, OUTBOX_POLL_SEC, dispatcher.run_once, jitter=1)
+
+metrics.register("email_outbox", lambda: dict(dispatcher.get_stats(), pending=pending_count()))
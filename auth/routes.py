@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify, make_response, url_for, redirect, current_app, abort
-import sqlite3, os, requests, bcrypt, secrets, time, re
+import sqlite3, os, secrets, time, re
 from authlib.integrations.flask_client import OAuth
 from dotenv import load_dotenv
+from assets import global_modules, hashing, session_tokens, rate_limit
+from assets.rate_limit import rate_limited
+from auth import outbox
 
 # the base url
 url_base_api = "https://api.fedorco.dev"
 url_base = "https://fedorco.dev"
-brevo_api_url = "https://api.brevo.com/v3/smtp/email"
 
 load_dotenv(override=True)
 
@@ -32,16 +34,11 @@ def init_oauth(app):
 
 auth_bp = Blueprint("auth", __name__)
 
-# Path to SQLite database file for auth
-db_path = os.path.join(os.path.dirname(__file__), "auth.db")
-
 def get_db():
     """
-    Connects to the SQLite database and sets row factory to access columns by name.
+    Returns this thread's pooled connection to the auth database (rows accessible by column name).
     """
-    conn = sqlite3.connect(db_path, timeout=5)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return global_modules.get_db("auth")
 
 def check_input(input, type):
     input_trimmed = input.strip()
@@ -55,32 +52,39 @@ def check_input(input, type):
     else:
         password_regex = r'^[A-Za-z0-9 !@#$%^&*._\-\?]{5,50}$'
         return bool(re.fullmatch(password_regex, input_trimmed))
-    
-def validate_session(sid):
-    conn = get_db()
-    try:
-        c = conn.cursor()
-        c.execute("SELECT * FROM sessions WHERE sid = ?", (sid,))
-        session = c.fetchone()
-        if not session:
-            return False
-        sid_expiry = session["expiry"]
-        time_now = int(time.time())
 
-        if time_now > int(sid_expiry):
-            c.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
-            conn.commit()
-            return False
-        else:
-            return session["uid"]
-    except Exception as e:
-        current_app.logger.info(f"DB error: {e}")
-        abort(500, description="Database error.")
-    finally:
-        conn.close()
+def request_email():
+    # rate-limit identity for login/signup: the normalized email from the JSON body
+    data = request.get_json(silent=True) or {}
+    return rate_limit.normalize_email(data.get("email"))
+
+def temp_user_token():
+    return request.cookies.get("temp_user_token")
 
+def create_session(c, uid, expiry):
+    """
+    Returns a new session id for `uid`: a signed stateless token when STATELESS_SESSIONS is on
+    (nothing is stored), otherwise a random sid inserted into the sessions table.
+    """
+    if session_tokens.STATELESS_SESSIONS:
+        return session_tokens.issue(uid, expiry)
+    session_id = secrets.token_hex(32)
+    c.execute("INSERT INTO sessions (sid, uid, expiry) VALUES (?, ?, ?)", (session_id, uid, expiry))
+    return session_id
+
+def hashing_busy_response():
+    # the bcrypt pool is saturated - reject fast instead of queueing the request
+    response = make_response(jsonify({"error": "Server is busy, please try again shortly."}), 503)
+    response.headers["Retry-After"] = "1"
+    return response
+
+def hashing_failed_response(e):
+    # a hashing job timed out or the pool broke; logged, then answered like a saturated pool
+    current_app.logger.error(f"Hashing failed: {e}")
+    return hashing_busy_response()
     
 @auth_bp.route("/signup", methods=["POST"])
+@rate_limited("signup", identity=request_email, get_conn=get_db)
 def signup():
     data = request.get_json()
     if not data:
@@ -107,16 +111,12 @@ def signup():
             return jsonify({"error": "User with this email already exists."}), 409
         
         # Hash password securely
-        password_bytes = password.encode("utf-8")
-        hashed_pw = bcrypt.hashpw(password_bytes, bcrypt.gensalt())
-        hashed_pw_str = hashed_pw.decode("utf-8")
+        hashed_pw_str = hashing.hash_secret(password)
 
         # generate a 6-digit verification code
         code_str = f"{secrets.randbelow(1000000):06}"
         
-        code_bytes = code_str.encode("utf-8")
-        hashed_code = bcrypt.hashpw(code_bytes, bcrypt.gensalt())
-        hashed_code_str = hashed_code.decode("utf-8")
+        hashed_code_str = hashing.hash_secret(code_str)
 
         # generate an access token for the user (to be stored in a cookie)
         token = secrets.token_hex(16)
@@ -126,40 +126,25 @@ def signup():
         time_now = int(time.time())
         token_expiry = time_now + token_expiry_sec
 
-        # send a verification email
-        brevo_headers = {"api-key": os.getenv("BREVO_API_KEY")}
-        brevo_request_data = {
-            "sender": {"name": "fedorco.dev", "email": "noreply@fedorco.dev"},
-            "to": [{"email": email}],
-            "subject": "Your fedorco.dev login code",
-            "htmlContent": f"""
+        # insert a new record
+        c.execute("INSERT OR REPLACE INTO temp_users (token, email, password, code, expiry) VALUES (?, ?, ?, ?, ?)", (token, email, hashed_pw_str, hashed_code_str, token_expiry))
+
+        # queue the verification email in the same transaction; the outbox dispatcher sends it
+        outbox.enqueue(
+            c,
+            email,
+            "Your fedorco.dev login code",
+            f"""
                 <div style="font-family:Arial, sans-serif; text-align:center;">
                     <img src="https://fedorco.dev/logo/fedorcodev_full_logo_bg.svg" alt="Fedorco Logo"
                         style="width:10rem; margin-bottom:1rem;">
                     <p>Your one-time code is: <b>{code_str}</b><br>(valid for 5 minutes)</p>
                 </div>
-            """
-        }
-        try:
-            response = requests.post(brevo_api_url, headers=brevo_headers, json=brevo_request_data)
-            if response.status_code >= 400:
-                current_app.logger.info(f"Brevo error: {response.status_code} {response.text}")
-                return jsonify({
-                    "error": "Brevo API error.",
-                    "status_code": response.status_code,
-                    "response": response.text
-                }), 500
-        except Exception as e:
-            conn.rollback()
-            current_app.logger.info(f"Error while sending an email: {e}")
-            return jsonify({
-                "error": "Request to Brevo failed.",
-                "description": str(e)
-            }), 500
-
-        # insert a new record
-        c.execute("INSERT OR REPLACE INTO temp_users (token, email, password, code, expiry) VALUES (?, ?, ?, ?, ?)", (token, email, hashed_pw_str, hashed_code_str, token_expiry))
+            """,
+            token_expiry
+        )
         conn.commit()
+        outbox.notify()
 
         response = make_response(jsonify({
             "message": "Email code sent."}))
@@ -174,6 +159,12 @@ def signup():
             path="/"
         )
         return response
+    except hashing.HashingBusy:
+        conn.rollback()
+        return hashing_busy_response()
+    except hashing.HashingFailed as e:
+        conn.rollback()
+        return hashing_failed_response(e)
     except Exception as e:
         conn.rollback()
         import traceback
@@ -186,6 +177,7 @@ def signup():
         conn.close()
 
 @auth_bp.route("/verify-code", methods=["POST"])
+@rate_limited("verify_code", identity=temp_user_token, get_conn=get_db)
 def verify_code():
     data = request.get_json()
     code = (data.get("code") or "").strip()
@@ -217,7 +209,7 @@ def verify_code():
             conn.commit()
             return jsonify({"error": "Code expired."}), 410
         # check whether the code matches
-        if not bcrypt.checkpw(code.encode("utf-8"), temp_user["code"].encode("utf-8")):
+        if not hashing.check_secret(code, temp_user["code"]):
             # check whether the user ran out of attempts (We already know we are gonna increment by 1, therefore we check, whether they have exceeded just two attempts - this saves us an unnecessary SQL query)
             if temp_user["attempts"] >= 2:
                 c.execute("DELETE FROM temp_users WHERE token = ?", (token,))
@@ -237,6 +229,15 @@ def verify_code():
             c.execute("INSERT INTO users (email, password) VALUES (?, ?)", (temp_user["email"], temp_user["password"]))
         c.execute("DELETE FROM temp_users WHERE token = ?", (token,))
         conn.commit()
+        if user:
+            # a Google-only account just got a password
+            global_modules.invalidate_user_profile(user["uid"])
+    except hashing.HashingBusy:
+        conn.rollback()
+        return hashing_busy_response()
+    except hashing.HashingFailed as e:
+        conn.rollback()
+        return hashing_failed_response(e)
     except Exception as e:
         conn.rollback()
         current_app.logger.info(f"DB error: {e}")
@@ -259,6 +260,7 @@ def verify_code():
     return response
 
 @auth_bp.route("/login", methods=["POST"])
+@rate_limited("login", identity=request_email, get_conn=get_db)
 def login():
     data = request.get_json()
     if not data:
@@ -275,8 +277,6 @@ def login():
     if not check_input(email, "email") or not check_input(password, "password"):
         return jsonify({"error": "Invalid credentials"}), 406
 
-    password_bytes = password.encode("utf-8")
-
     conn = get_db()
     try:
         c = conn.cursor()
@@ -294,15 +294,17 @@ def login():
         return jsonify({"error": "Invalid email or password."}), 401
 
     # Check password hash
-    password_db_str = user["password"]
-    password_db_bytes = password_db_str.encode("utf-8")
+    try:
+        password_matches = hashing.check_secret(password, user["password"])
+    except hashing.HashingBusy:
+        return hashing_busy_response()
+    except hashing.HashingFailed as e:
+        return hashing_failed_response(e)
 
     # if login is not successful
-    if not bcrypt.checkpw(password_bytes, password_db_bytes):
+    if not password_matches:
         return jsonify({"error": "Invalid email or password."}), 401
 
-    session_id = secrets.token_hex(32)
-
     if remember_me:
         session_lifespan_seconds = 30 * 24 * 60 * 60
     else:
@@ -314,7 +316,7 @@ def login():
     conn = get_db()
     try:
         c = conn.cursor()
-        c.execute("INSERT INTO sessions (sid, uid, expiry) VALUES (?, ?, ?)", (session_id, user["uid"], expiry))
+        session_id = create_session(c, user["uid"], expiry)
         conn.commit()
     except Exception as e:
         conn.rollback()
@@ -359,12 +361,16 @@ def logout():
     if not session_id:
         return jsonify({"error": "No active session."}), 401
     
-    if validate_session(session_id):
+    if global_modules.validate_session(session_id):
         conn = get_db()
         try:
             c = conn.cursor()
-            c.execute("DELETE FROM sessions WHERE sid = ?", (session_id,))
+            if session_tokens.is_token(session_id):
+                session_tokens.revoke_token(c, session_id)
+            else:
+                c.execute("DELETE FROM sessions WHERE sid = ?", (session_id,))
             conn.commit()
+            global_modules.invalidate_session(session_id)
         except Exception as e:
             conn.rollback()
             current_app.logger.info(f"DB error: {e}")
@@ -394,7 +400,8 @@ def change_password():
     if not session_id:
         return jsonify({"error": "No active session."}), 401
     
-    if validate_session(session_id):
+    user_id = global_modules.validate_session(session_id)
+    if user_id:
         data = request.get_json()
         if not data:
             return jsonify({"error": "Invalid JSON."}), 406
@@ -407,16 +414,9 @@ def change_password():
         if not check_input(password_new, "password"):
             return jsonify({"error": "Invalid credentials"}), 406
 
-        # Find the user from session
         conn = get_db()
         try:
             c = conn.cursor()
-            c.execute("SELECT uid FROM sessions WHERE sid = ?", (session_id,))
-            session_obj = c.fetchone()
-            if not session_obj:
-                return jsonify({"error": "Invalid session."}), 401
-            user_id = session_obj["uid"]
-            
             # Check whether the user is logged in only via Google
             c.execute("SELECT password FROM users WHERE uid = ?", (user_id,))
             user_pass = c.fetchone()
@@ -424,17 +424,23 @@ def change_password():
                 return jsonify({"error": "This user is signed in only via Google."}), 403
             
             # Hash the new password securely
-            password_new_bytes = password_new.encode("utf-8")
-            hashed_pw_new = bcrypt.hashpw(password_new_bytes, bcrypt.gensalt())
-            hashed_pw_new_str = hashed_pw_new.decode("utf-8")
+            hashed_pw_new_str = hashing.hash_secret(password_new)
 
             # update the password in DB
             c.execute("UPDATE users SET password = ? WHERE uid = ?", (hashed_pw_new_str, user_id))
             
-            # delete old sessions
+            # delete old sessions and revoke any signed session tokens
             c.execute("DELETE FROM sessions where uid = ?", (user_id,))
+            session_tokens.revoke_user(c, user_id)
 
             conn.commit()
+            global_modules.invalidate_user_sessions(user_id)
+        except hashing.HashingBusy:
+            conn.rollback()
+            return hashing_busy_response()
+        except hashing.HashingFailed as e:
+            conn.rollback()
+            return hashing_failed_response(e)
         except Exception as e:
             conn.rollback()
             current_app.logger.info(f"DB error: {e}")
@@ -465,25 +471,22 @@ def delete_account():
     if not session_id:
         return jsonify({"error": "No active session."}), 401
     
-    if validate_session(session_id):
+    user_id = global_modules.validate_session(session_id)
+    if user_id:
         conn = get_db()
         try:
             c = conn.cursor()
-            user_id_obj = c.execute("SELECT uid FROM sessions WHERE sid = ?", (session_id,)).fetchone()
-
-            if not user_id_obj:
-                return jsonify({"error": "Invalid session."}), 401
-            
-            user_id = user_id_obj["uid"]
             user_obj = c.execute("SELECT * FROM users WHERE uid = ?", (user_id,)).fetchone()
             if not user_obj:
                 return jsonify({"error": "User not found."}), 404
             user_email = user_obj["email"]
 
             c.execute("DELETE FROM sessions WHERE uid = ?", (user_id,))
+            session_tokens.revoke_user(c, user_id)
             c.execute("DELETE FROM users WHERE uid = ?", (user_id,))
 
             conn.commit()
+            global_modules.invalidate_user_sessions(user_id)
         except Exception as e:
             conn.rollback()
             current_app.logger.info(f"DB error: {e}")
@@ -538,6 +541,7 @@ def google_callback():
                 # link the google_id to the existing account
                 c.execute("UPDATE users SET google_id = ? WHERE email = ?", (google_id, email))
                 conn.commit()
+                global_modules.invalidate_user_profile(user["uid"])
             else:
                 # create a new user
                 c.execute("INSERT INTO users (email, password, google_id) VALUES (?, ?, ?)", (email, None, google_id))
@@ -552,14 +556,13 @@ def google_callback():
         conn.close()
 
     # Create a session for this user
-    session_id = secrets.token_hex(32)
     session_lifespan_seconds = 30 * 24 * 60 * 60
     expiry = int(time.time()) + session_lifespan_seconds  # 30 days
 
     conn = get_db()
     try:
         c = conn.cursor()
-        c.execute("INSERT INTO sessions (sid, uid, expiry) VALUES (?, ?, ?)", (session_id, user["uid"], expiry))
+        session_id = create_session(c, user["uid"], expiry)
         conn.commit()
     finally:
         conn.close()
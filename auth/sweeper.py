@@ -0,0 +1,64 @@
+from assets import global_modules, metrics
+import time, os, logging, threading
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL_SEC = int(os.getenv("SWEEP_INTERVAL_SEC", "600"))
+SWEEP_BATCH_SIZE = int(os.getenv("SWEEP_BATCH_SIZE", "500"))
+# pause between batches so request writers can grab the write lock
+SWEEP_BATCH_PAUSE_SEC = 0.05
+
+# tables with an indexed `expiry` column (unix seconds)
+SWEPT_TABLES = ("sessions", "temp_users", "email_outbox", "session_revocations", "rate_limits")
+
+_lock = threading.Lock()
+_stats = {"runs": 0, "last_run": None, "last_purged": {}, "total_purged": {t: 0 for t in SWEPT_TABLES}}
+
+def purge_expired(conn, table, batch_size=SWEEP_BATCH_SIZE, now=None):
+    """
+    Deletes expired rows from `table` in batches of `batch_size`, committing after each batch
+    so no single write transaction stays open for long. Returns the number of purged rows.
+    """
+    if table not in SWEPT_TABLES:
+        raise ValueError(f"Table {table} cannot be swept.")
+    now = int(time.time()) if now is None else now
+    purged = 0
+    c = conn.cursor()
+    while True:
+        c.execute(f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE expiry < ? LIMIT ?)", (now, batch_size))
+        deleted = c.rowcount
+        conn.commit()
+        purged += deleted
+        if deleted < batch_size:
+            return purged
+        time.sleep(SWEEP_BATCH_PAUSE_SEC)
+
+def sweep(batch_size=SWEEP_BATCH_SIZE):
+    conn = global_modules.get_db("auth")
+    try:
+        purged = {table: purge_expired(conn, table, batch_size) for table in SWEPT_TABLES}
+    finally:
+        conn.close()
+
+    with _lock:
+        _stats["runs"] += 1
+        _stats["last_run"] = int(time.time())
+        _stats["last_purged"] = purged
+        for table, count in purged.items():
+            _stats["total_purged"][table] += count
+    if any(purged.values()):
+        logger.info(f"Expiry sweeper purged {purged}")
+    return purged
+
+def stats():
+    with _lock:
+        return {
+            "interval_sec": SWEEP_INTERVAL_SEC,
+            "batch_size": SWEEP_BATCH_SIZE,
+            "runs": _stats["runs"],
+            "last_run": _stats["last_run"],
+            "last_purged": dict(_stats["last_purged"]),
+            "total_purged": dict(_stats["total_purged"])
+        }
+
+metrics.register("expiry_sweeper", stats)
@@ -0,0 +1,80 @@
+"""
+Micro-benchmark of the URL layer in link_organizer.lorg_modules.
+
+Times validators.url on its own, check_url with a cold and a warm cache, and the canonical
+form + url_hash used for duplicate detection, over a realistic mix of bookmark URLs.
+
+    python -m benchmarks.canonicalize
+    python -m benchmarks.canonicalize --urls 50000 --repeat 5 --out canonicalize.json
+"""
+import argparse, json, random, time
+import validators
+from link_organizer import lorg_modules
+from benchmarks.seed import HOSTS
+
+SHAPES = [
+    "https://{host}/page/{n}",
+    "http://{host}/search?q={n}&lang=cs",
+    "{host}/article/{n}#comments",
+    "//{host}/static/{n}.html",
+    "HTTPS://WWW.{host}:443/{n}/",
+    "https://{host}/{n}?utm_source=newsletter&utm_medium=email"
+]
+
+def make_urls(count, distinct, rng):
+    # bookmark files repeat URLs a lot, so draw `count` inputs from a smaller pool of `distinct` ones
+    pool = [rng.choice(SHAPES).format(host=rng.choice(HOSTS), n=rng.randint(1, 10 ** 6)) for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(count)]
+
+def timed(fn, urls, repeat, setup=None):
+    best = None
+    for _ in range(repeat):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        for url in urls:
+            fn(url)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {"total_ms": round(best * 1000, 2), "per_url_us": round(best / len(urls) * 1e6, 3)}
+
+def clear_caches():
+    lorg_modules._check_url.cache_clear()
+    lorg_modules.url_hash.cache_clear()
+
+def run(args):
+    rng = random.Random(args.seed)
+    urls = make_urls(args.urls, args.distinct, rng)
+    normalized = [lorg_modules.check_url(url) for url in urls]
+    prefixed = [url if "://" in url else "https://" + url.lstrip("/") for url in urls]
+
+    results = {"urls": len(urls), "distinct": args.distinct}
+    results["validators.url"] = timed(validators.url, prefixed, args.repeat)
+
+    # cold: every distinct URL pays for the full parse (+ validators.url) once, repeats hit the cache
+    results["check_url (cold cache)"] = timed(lorg_modules.check_url, urls, args.repeat, setup=clear_caches)
+    results["check_url (warm cache)"] = timed(lorg_modules.check_url, urls, args.repeat)
+    results["url_hash (cold cache)"] = timed(lorg_modules.url_hash, normalized, args.repeat, setup=clear_caches)
+    results["url_hash (warm cache)"] = timed(lorg_modules.url_hash, normalized, args.repeat)
+    results["cache"] = lorg_modules.url_cache_stats()
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark URL validation and canonicalization.")
+    parser.add_argument("--urls", type=int, default=20000, help="inputs per run")
+    parser.add_argument("--distinct", type=int, default=2000, help="distinct URLs among the inputs")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (best is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    for name, value in results.items():
+        if isinstance(value, dict) and "per_url_us" in value:
+            print(f"{name:<26} {value['per_url_us']:>10.3f} us/url {value['total_ms']:>10.2f} ms total")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
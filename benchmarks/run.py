@@ -0,0 +1,252 @@
+"""
+End-to-end load test for every blueprint.
+
+Builds the app against temporary, freshly migrated databases seeded at realistic scale, stubs the
+Strava / SkolaOnline upstreams, drives the endpoints with concurrent HTTP clients and reports
+throughput, p50/p95/p99 latency and SQLite statements per request.
+
+    python -m benchmarks.run --out results.json
+    python -m benchmarks.run --quick --compare results.json    # exit code 1 on regressions
+"""
+import argparse, json, logging, os, random, sys, tempfile, threading, time, platform
+from concurrent.futures import ThreadPoolExecutor
+
+API_KEY = "benchmark-api-key"
+PASSWORD = "benchmark1"
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def configure_environment(args):
+    # must happen before the app (and its blueprints) are imported
+    os.environ.update({
+        "API_KEY": API_KEY,
+        "FLASK_SECRET_KEY": "benchmark-secret",
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "SWEEP_INTERVAL_SEC": "0",
+        "OUTBOX_POLL_SEC": "0",
+        "LORG_COMPACT_INTERVAL_SEC": "0",
+        "LINK_CHECK_INTERVAL_SEC": "0",
+        "PREWARM_ENABLED": "0",
+        "RATE_LIMIT_LOGIN": "1000000/1",
+        "RATE_LIMIT_SIGNUP": "1000000/1",
+        "RATE_LIMIT_VERIFY_CODE": "1000000/1"
+    })
+
+def build_app(args, tmp):
+    from assets import db, migrations
+    from benchmarks import seed, stubs
+
+    for name in db.DB_PATHS:
+        db.DB_PATHS[name] = os.path.join(tmp, f"{name}.db")
+    db.enable_query_counting()
+    migrations.migrate_all()
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    sessions = seed.seed_auth(db.DB_PATHS["auth"], args.users, args.sessions, PASSWORD, args.bcrypt_rounds, rng)
+    layout = seed.seed_link_organizer(db.DB_PATHS["link_organizer"], args.users, args.items, rng=rng)
+    print(f"Seeded {args.users} users, {args.sessions} sessions, {args.items} items in {time.perf_counter() - started:.1f}s")
+
+    from app import app
+    stubs.install(args.upstream_latency)
+    return app, sessions, layout
+
+def scenarios(sessions, layout):
+    """
+    name -> fn(rng) returning (method, path, request kwargs)
+    """
+    uids = list(sessions)
+
+    def user(rng):
+        uid = rng.choice(uids)
+        return uid, {"session": sessions[uid]}
+
+    def getinfo(rng):
+        _, cookies = user(rng)
+        return "GET", "/user/getinfo", {"cookies": cookies}
+
+    def get_items(rng):
+        uid, cookies = user(rng)
+        return "GET", f"/linkorganizer/get-items?pid={rng.choice(layout[uid]['folders'])}", {"cookies": cookies}
+
+    def get_tree(rng):
+        _, cookies = user(rng)
+        return "GET", "/linkorganizer/get-tree", {"cookies": cookies}
+
+    def add_item(rng):
+        uid, cookies = user(rng)
+        body = {"pid": rng.choice(layout[uid]["folders"]), "type": "link", "name": "Bench link", "link": f"example.com/{rng.randint(1, 10 ** 9)}"}
+        return "POST", "/linkorganizer/add-item", {"cookies": cookies, "json": body}
+
+    def edit_item(rng):
+        uid, cookies = user(rng)
+        iid = rng.choice(layout[uid]["folders"][1:] or [layout[uid]["first"]])
+        return "PATCH", f"/linkorganizer/edit-item?iid={iid}", {"cookies": cookies, "json": {"type": "folder", "name": f"Renamed {rng.randint(1, 999)}"}}
+
+    def delete_item(rng):
+        uid, cookies = user(rng)
+        return "DELETE", f"/linkorganizer/delete-item?iid={rng.randint(layout[uid]['first'], layout[uid]['last'])}", {"cookies": cookies}
+
+    def strava_meal(rng):
+        return "GET", "/stravaapi/get-today-meal", {"headers": {"x-api-key": API_KEY}}
+
+    def skolaonline_class(rng):
+        return "GET", "/skolaonlineapi/get-next-class", {"headers": {"x-api-key": API_KEY}}
+
+    def login(rng):
+        uid = rng.choice(uids)
+        return "POST", "/auth/login", {"json": {"email": f"user{uid}@bench.fedorco.dev", "password": PASSWORD}}
+
+    return {
+        "getinfo": getinfo,
+        "get_items": get_items,
+        "get_tree": get_tree,
+        "add_item": add_item,
+        "edit_item": edit_item,
+        "delete_item": delete_item,
+        "strava_meal": strava_meal,
+        "skolaonline_class": skolaonline_class,
+        "login": login
+    }
+
+def run_scenario(base_url, name, make_request, clients, duration, seed):
+    import requests
+    from assets import db
+
+    latencies = []
+    statuses = {}
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(n):
+        nonlocal errors
+        rng = random.Random(f"{seed}-{name}-{n}")
+        session = requests.Session()
+        local_latencies, local_statuses, local_errors = [], {}, 0
+        while time.perf_counter() < deadline:
+            method, path, kwargs = make_request(rng)
+            started = time.perf_counter()
+            try:
+                status = session.request(method, base_url + path, timeout=30, **kwargs).status_code
+            except requests.RequestException:
+                status = "exception"
+            local_latencies.append((time.perf_counter() - started) * 1000)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            if status == "exception" or status >= 500:
+                local_errors += 1
+        with lock:
+            latencies.extend(local_latencies)
+            for status, count in local_statuses.items():
+                statuses[str(status)] = statuses.get(str(status), 0) + count
+            errors += local_errors
+
+    queries_before = db.query_count()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - started
+    queries = db.query_count() - queries_before
+
+    requests_done = len(latencies)
+    return {
+        "requests": requests_done,
+        "errors": errors,
+        "statuses": statuses,
+        "throughput_rps": round(requests_done / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "queries_per_request": round(queries / requests_done, 2) if requests_done else 0.0
+    }
+
+def compare(results, baseline, threshold):
+    """
+    Returns a list of human-readable regressions: p95 latency up, or throughput down, by more than `threshold`.
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if current["queries_per_request"] > previous["queries_per_request"] * (1 + threshold):
+            regressions.append(f"{name}: queries/request {previous['queries_per_request']} -> {current['queries_per_request']}")
+    return regressions
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="End-to-end benchmark for all blueprints.")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--sessions", type=int, default=200000)
+    parser.add_argument("--items", type=int, default=300000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--scenarios", default="", help="comma-separated subset of scenarios")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12)
+    parser.add_argument("--upstream-latency", type=float, default=0.0, help="simulated upstream delay on cache misses")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="small dataset and short runs, e.g. for CI")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="baseline results JSON to flag regressions against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed relative change before flagging")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.users, args.sessions, args.items = 200, 2000, 10000
+        args.duration, args.clients, args.bcrypt_rounds = 2.0, 4, 4
+    return args
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    configure_environment(args)
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app, sessions, layout = build_app(args, tmp)
+        from werkzeug.serving import make_server
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+        selected = scenarios(sessions, layout)
+        if args.scenarios:
+            wanted = args.scenarios.split(",")
+            selected = {name: fn for name, fn in selected.items() if name in wanted}
+
+        results = {
+            "meta": {
+                "timestamp": int(time.time()),
+                "python": platform.python_version(),
+                "users": args.users, "sessions": args.sessions, "items": args.items,
+                "clients": args.clients, "duration": args.duration, "bcrypt_rounds": args.bcrypt_rounds
+            },
+            "scenarios": {}
+        }
+        try:
+            for name, make_request in selected.items():
+                result = run_scenario(base_url, name, make_request, args.clients, args.duration, args.seed)
+                results["scenarios"][name] = result
+                print(f"{name:>18}: {result['throughput_rps']:>8} req/s  p50 {result['p50_ms']:>7}ms  p95 {result['p95_ms']:>7}ms  "
+                      f"p99 {result['p99_ms']:>7}ms  {result['queries_per_request']:>5} queries/req  errors {result['errors']}")
+        finally:
+            server.shutdown()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import random, secrets, sqlite3, time, bcrypt
+from link_organizer.lorg_modules import url_hash
+
+CHUNK_SIZE = 10000
+COLORS = ["white", "red", "orange", "yellow", "green", "blue", "purple", "pink"]
+ICONS = ["biology", "chemistry", "coding", "cooking", "geography", "history", "default", "math"]
+HOSTS = ["example.com", "wikipedia.org", "github.com", "python.org", "sqlite.org", "mozilla.org", "fedorco.dev"]
+
+def _chunks(rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def seed_auth(path, users, sessions, password, rounds=4, rng=None):
+    """
+    Inserts `users` users sharing one password and `sessions` valid sessions spread over them.
+    Returns {uid: sid} with one session per user for the load generator.
+    """
+    rng = rng or random.Random(0)
+    hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+    expiry = int(time.time()) + 30 * 24 * 60 * 60
+    conn = sqlite3.connect(path)
+    try:
+        conn.executemany(
+            "INSERT INTO users (uid, email, password) VALUES (?, ?, ?)",
+            ((uid, f"user{uid}@bench.fedorco.dev", hashed) for uid in range(1, users + 1))
+        )
+        session_for_user = {}
+        def session_rows():
+            for n in range(sessions):
+                uid = n + 1 if n < users else rng.randint(1, users)
+                sid = secrets.token_hex(32)
+                session_for_user.setdefault(uid, sid)
+                yield sid, uid, expiry
+        for chunk in _chunks(session_rows()):
+            conn.executemany("INSERT INTO sessions (sid, uid, expiry) VALUES (?, ?, ?)", chunk)
+        conn.commit()
+        return session_for_user
+    finally:
+        conn.close()
+
+def seed_link_organizer(path, users, items, max_depth=3, rng=None):
+    """
+    Inserts about `items` user_items spread evenly over the users, as a tree of folders and links
+    up to `max_depth` levels deep. Returns {uid: {"folders": [iids, 0 = root], "first": iid, "last": iid}}.
+    """
+    rng = rng or random.Random(0)
+    per_user = max(1, items // users)
+    layout = {}
+
+    def item_rows():
+        iid = 0
+        for uid in range(1, users + 1):
+            first = iid + 1
+            user_folders = [(0, 0)]    # (iid, depth)
+            for n in range(per_user):
+                pid, depth = rng.choice(user_folders)
+                iid += 1
+                if depth < max_depth and rng.random() < 0.15:
+                    user_folders.append((iid, depth + 1))
+                    yield iid, pid, uid, "folder", rng.choice(ICONS), f"Folder {n}", None, rng.choice(COLORS), None
+                else:
+                    link = f"https://{rng.choice(HOSTS)}/page/{rng.randint(1, 10 ** 6)}"
+                    yield iid, pid, uid, "link", "default", f"Link {n}", link, "white", url_hash(link)
+            layout[uid] = {"folders": [f for f, _ in user_folders], "first": first, "last": iid}
+
+    conn = sqlite3.connect(path)
+    try:
+        for chunk in _chunks(item_rows()):
+            conn.executemany(
+                "INSERT INTO user_items (iid, pid, uid, type, icon, name, link, color, url_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                chunk
+            )
+        conn.commit()
+        return layout
+    finally:
+        conn.close()
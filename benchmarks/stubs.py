@@ -0,0 +1,27 @@
+import time
+
+# Local stand-ins for the upstream scrapers, so benchmarks never reach app.strava.cz or skolaonline.cz.
+# `latency` simulates the upstream round trip on a cache miss.
+
+def install(latency=0.0):
+    import strava_api.routes as strava_routes
+    import skolaonline_api.routes as skolaonline_routes
+    from strava_api.main import get_date, get_iso_date
+
+    def fake_meals(account=None):
+        time.sleep(latency)
+        return [{
+            "date": get_date(), "day": get_iso_date(), "meal_num": "Oběd 1", "meal_name": "Benchmark meal",
+            "menu": [{"meal_num": "Oběd 1", "meal_name": "Benchmark meal", "ordered": True}]
+        }]
+
+    def fake_today_lessons():
+        time.sleep(latency)
+        now = int(time.time())
+        return [
+            {"subject": "M", "Učebna": "101", "timestamp": now + 3600},
+            {"subject": "F", "Učebna": "102", "timestamp": now + 7200}
+        ]
+
+    strava_routes.get_meals = fake_meals
+    skolaonline_routes.get_today_lessons = fake_today_lessons
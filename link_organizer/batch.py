@@ -0,0 +1,191 @@
+from link_organizer.lorg_modules import check_url, normalize_name, url_hash, allowed_colors, allowed_icons
+from link_organizer import tree
+import json, os
+
+# operations accepted in one /batch request
+BATCH_MAX_OPS = int(os.getenv("LORG_BATCH_MAX_OPS", "500"))
+OPERATIONS = ("add", "edit", "move", "delete")
+
+class BatchError(Exception):
+    """
+    Rejects the whole batch; `index` is the offending operation, `status` the HTTP status to answer with.
+    """
+    def __init__(self, index, message, status=400):
+        super().__init__(message)
+        self.index = index
+        self.message = message
+        self.status = status
+
+def parse_ref(value, refs, index, allow_root=False):
+    """
+    Resolves an item reference: a literal iid, or "$name" for an item added earlier in the batch.
+    Returns (iid, ref name or None).
+    """
+    if isinstance(value, str) and value.startswith("$"):
+        if value[1:] not in refs:
+            raise BatchError(index, f"Unknown reference {value}.")
+        return None, value[1:]
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or value < (0 if allow_root else 1):
+        raise BatchError(index, "Invalid item ID.")
+    return value, None
+
+def parse_position(value, index):
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise BatchError(index, "Invalid position.")
+    return value
+
+def parse_fields(op, index):
+    # same rules as add-item / edit-item
+    item_type = (op.get("type") or "").strip()
+    if item_type not in ("link", "folder"):
+        raise BatchError(index, "Invalid item type.")
+
+    link = op.get("link") or None
+    if item_type == "link":
+        link = check_url(link)
+        if not link:
+            raise BatchError(index, "Entered link does not meet the required format.")
+
+    name = normalize_name(op.get("name"))
+    if not name:
+        raise BatchError(index, "Entered name does not meet the required format.")
+
+    color = (op.get("color") or "white").strip()
+    color = color if color in allowed_colors else "white"
+    icon = (op.get("icon") or "default").strip()
+    icon = icon if icon in allowed_icons else "default"
+    return {"type": item_type, "link": link, "name": name, "color": color, "icon": icon}
+
+def parse_ops(ops):
+    """
+    Validates every operation before anything touches the DB. Returns the parsed operations.
+    """
+    if not isinstance(ops, list) or not ops:
+        raise BatchError(None, "Missing operations.")
+    if len(ops) > BATCH_MAX_OPS:
+        raise BatchError(None, f"Too many operations (max {BATCH_MAX_OPS}).")
+
+    refs = set()
+    parsed = []
+    for index, op in enumerate(ops):
+        if not isinstance(op, dict) or op.get("op") not in OPERATIONS:
+            raise BatchError(index, "Invalid operation.")
+        kind = op["op"]
+        item = {"op": kind}
+        if kind == "add":
+            item["pid"] = parse_ref(op.get("pid", 0), refs, index, allow_root=True)
+            item["fields"] = parse_fields(op, index)
+            ref = op.get("ref")
+            if ref is not None:
+                if not isinstance(ref, str) or not ref or ref in refs:
+                    raise BatchError(index, "Invalid or duplicate reference name.")
+                refs.add(ref)
+            item["ref"] = ref
+        else:
+            item["iid"] = parse_ref(op.get("iid"), refs, index)
+            if kind == "edit":
+                item["fields"] = parse_fields(op, index)
+            elif kind == "move":
+                item["pid"] = parse_ref(op["pid"], refs, index, allow_root=True) if op.get("pid") is not None else (None, None)
+                item["position"] = parse_position(op.get("position"), index)
+        parsed.append(item)
+    return parsed
+
+def load_types(c, uid, ops):
+    """
+    Types of all existing items the batch refers to by literal iid, in one query.
+    """
+    iids = set()
+    for op in ops:
+        for key in ("iid", "pid"):
+            if key in op and op[key][0]:
+                iids.add(op[key][0])
+    c.execute(
+        "SELECT i.iid, i.type FROM json_each(?) j CROSS JOIN user_items i ON i.iid = j.value WHERE i.uid = ?",
+        (json.dumps(list(iids)), uid)
+    )
+    return {row["iid"]: row["type"] for row in c.fetchall()}
+
+def apply_ops(c, uid, ops):
+    """
+    Applies parsed operations in order on cursor `c` (the caller commits or rolls back).
+    Runs of consecutive edits are written with one executemany and runs of deletes with one statement;
+    paths and positions of added items are filled in by the insert trigger.
+    Returns one result per operation.
+    """
+    # sqlite3 only opens transactions implicitly for INSERT/UPDATE/DELETE, not for WITH ... DELETE
+    if not c.connection.in_transaction:
+        c.execute("BEGIN IMMEDIATE")
+    types = load_types(c, uid, ops)
+    created = {}
+    results = []
+    pending_edits = []
+    pending_deletes = []
+
+    def resolve(ref, index, folder=False):
+        iid, name = ref
+        if name is not None:
+            iid = created[name]
+        if iid == 0 and folder:
+            return 0
+        if iid not in types:
+            raise BatchError(index, "Item not found.", 404)
+        if folder and types[iid] != "folder":
+            raise BatchError(index, "Parent item is not a folder.")
+        return iid
+
+    def flush_edits():
+        if pending_edits:
+            c.executemany("UPDATE user_items SET icon = ?, name = ?, link = ?, color = ?, url_hash = ? WHERE uid = ? AND iid = ?", pending_edits)
+            pending_edits.clear()
+
+    def flush_deletes():
+        if pending_deletes:
+            for iid in tree.delete_subtrees(c, uid, pending_deletes):
+                types.pop(iid, None)
+            pending_deletes.clear()
+
+    for index, op in enumerate(ops):
+        kind = op["op"]
+        # a run is written before the next kind of operation, so every op sees the effect of the ones before it
+        if kind != "edit":
+            flush_edits()
+        if kind != "delete":
+            flush_deletes()
+
+        if kind == "add":
+            pid = resolve(op["pid"], index, folder=True)
+            fields = op["fields"]
+            c.execute(
+                "INSERT INTO user_items (pid, uid, type, icon, name, link, color, url_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (pid, uid, fields["type"], fields["icon"], fields["name"], fields["link"], fields["color"], url_hash(fields["link"]))
+            )
+            iid = c.lastrowid
+            types[iid] = fields["type"]
+            if op["ref"] is not None:
+                created[op["ref"]] = iid
+            results.append({"op": kind, "iid": iid, "status": "created"})
+        elif kind == "edit":
+            iid = resolve(op["iid"], index)
+            fields = op["fields"]
+            pending_edits.append((fields["icon"], fields["name"], fields["link"], fields["color"], url_hash(fields["link"]), uid, iid))
+            results.append({"op": kind, "iid": iid, "status": "edited"})
+        elif kind == "move":
+            iid = resolve(op["iid"], index)
+            pid = resolve(op["pid"], index, folder=True) if op["pid"] != (None, None) else None
+            try:
+                moved = tree.move_item(c, uid, iid, pid, op["position"])
+            except tree.MoveError as e:
+                raise BatchError(index, e.message, e.status)
+            results.append({"op": kind, "iid": iid, "status": "moved", "pid": moved["pid"], "position": moved["position"]})
+        else:
+            iid = resolve(op["iid"], index)
+            pending_deletes.append(iid)
+            results.append({"op": kind, "iid": iid, "status": "deleted"})
+    flush_edits()
+    flush_deletes()
+    return results
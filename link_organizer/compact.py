@@ -0,0 +1,71 @@
+from assets import global_modules, metrics, db as db_pool
+from link_organizer import tree
+import threading, sqlite3, time, os, sys, logging
+
+logger = logging.getLogger(__name__)
+
+COMPACT_INTERVAL_SEC = int(os.getenv("LORG_COMPACT_INTERVAL_SEC", str(24 * 60 * 60)))
+COMPACT_BATCH_SIZE = int(os.getenv("LORG_COMPACT_BATCH_SIZE", "1000"))
+# free pages returned to the file system per run (0 = all of them)
+VACUUM_PAGES = int(os.getenv("LORG_VACUUM_PAGES", "0"))
+
+_lock = threading.Lock()
+_stats = {"runs": 0, "last_run": None, "last_purged": 0, "total_purged": 0, "last_freed_pages": 0, "incremental_vacuum": None}
+
+def enable_incremental_vacuum(path=None):
+    """
+    Switches the database to auto_vacuum = INCREMENTAL. On an existing database that takes a full VACUUM,
+    which rewrites the file and locks out every writer, so it is a one-off command rather than a migration.
+    Returns whether the database was rebuilt.
+    """
+    conn = sqlite3.connect(path or db_pool.DB_PATHS["link_organizer"], timeout=30, isolation_level=None)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+def compact(batch_size=COMPACT_BATCH_SIZE, vacuum_pages=VACUUM_PAGES):
+    """
+    Purges orphaned items left behind by the old single-row delete, then releases free pages
+    with an incremental vacuum. Returns {"purged": rows, "freed_pages": pages}.
+    """
+    conn = global_modules.get_db("link_organizer")
+    try:
+        purged = tree.purge_orphans(conn, batch_size)
+        # without auto_vacuum = INCREMENTAL (see enable_incremental_vacuum) free pages are only reused, never released
+        incremental = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        freed = 0
+        if incremental:
+            free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+            freed = free_before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+    finally:
+        conn.close()
+
+    with _lock:
+        _stats["runs"] += 1
+        _stats["last_run"] = int(time.time())
+        _stats["last_purged"] = purged
+        _stats["total_purged"] += purged
+        _stats["last_freed_pages"] = freed
+        _stats["incremental_vacuum"] = incremental
+    if purged or freed:
+        logger.info(f"Link Organizer compaction purged {purged} orphans, freed {freed} pages")
+    return {"purged": purged, "freed_pages": freed}
+
+def stats():
+    with _lock:
+        return dict(_stats, interval_sec=COMPACT_INTERVAL_SEC)
+
+metrics.register("link_organizer_compaction", stats)
+
+if __name__ == "__main__":
+    # one-off run: python -m link_organizer.compact [--enable-incremental-vacuum]
+    if "--enable-incremental-vacuum" in sys.argv[1:]:
+        print(f"Incremental vacuum {'enabled' if enable_incremental_vacuum() else 'already enabled'}.")
+    print(compact())
+    sys.exit(0)
@@ -0,0 +1,52 @@
+from link_organizer.lorg_modules import canonical_url
+from link_organizer import tree
+import json
+
+# groups returned by one /duplicates call
+DUPLICATES_MAX_GROUPS = 500
+
+DUPLICATE_HASHES_QUERY = """
+    SELECT url_hash FROM user_items
+    WHERE uid = ? AND url_hash IS NOT NULL
+    GROUP BY url_hash HAVING count(*) > 1
+    LIMIT ?
+"""
+
+def find_duplicates(c, uid, max_groups=DUPLICATES_MAX_GROUPS):
+    """
+    A user's links that share a canonical URL, as groups of at least two items (oldest first).
+    Hash matches are re-checked against the canonical URLs, so a hash collision never merges two links.
+    """
+    c.execute(DUPLICATE_HASHES_QUERY, (uid, max_groups))
+    hashes = [row[0] for row in c.fetchall()]
+    if not hashes:
+        return []
+    c.execute(
+        "SELECT iid, pid, name, link, url_hash FROM user_items WHERE uid = ? AND url_hash IN (SELECT value FROM json_each(?)) ORDER BY iid",
+        (uid, json.dumps(hashes))
+    )
+    groups = {}
+    for row in c.fetchall():
+        groups.setdefault(canonical_url(row["link"]), []).append(
+            {"iid": row["iid"], "pid": row["pid"], "name": row["name"], "link": row["link"]}
+        )
+    return [{"url": url, "items": items} for url, items in groups.items() if len(items) > 1]
+
+def merge(c, uid, keep=None):
+    """
+    Deletes the duplicates of item `keep`, or, without `keep`, every duplicate but the oldest item
+    of each group. Returns the deleted iids; None if `keep` is not a link of this user.
+    """
+    if keep is not None:
+        c.execute("SELECT link, url_hash FROM user_items WHERE uid = ? AND iid = ? AND url_hash IS NOT NULL", (uid, keep))
+        item = c.fetchone()
+        if item is None:
+            return None
+        canonical = canonical_url(item["link"])
+        c.execute("SELECT iid, link FROM user_items WHERE uid = ? AND url_hash = ? AND iid != ?", (uid, item["url_hash"], keep))
+        remove = [row["iid"] for row in c.fetchall() if canonical_url(row["link"]) == canonical]
+    else:
+        remove = [item["iid"] for group in find_duplicates(c, uid) for item in group["items"][1:]]
+    if not remove:
+        return []
+    return tree.delete_subtrees(c, uid, remove)
@@ -0,0 +1,186 @@
+from assets import global_modules, background, metrics
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlsplit, urljoin
+import requests, ipaddress, socket, threading, random, time, os, logging
+
+logger = logging.getLogger(__name__)
+
+# Stored links are probed in the background and the outcome kept in link_health (one row per link,
+# created by triggers), so marking dead links never costs a request any time.
+LINK_CHECK_INTERVAL_SEC = int(os.getenv("LINK_CHECK_INTERVAL_SEC", "300"))
+LINK_CHECK_BATCH_SIZE = int(os.getenv("LINK_CHECK_BATCH_SIZE", "200"))
+LINK_CHECK_WORKERS = int(os.getenv("LINK_CHECK_WORKERS", "16"))
+# concurrent probes per host, so a user with 500 links on one site doesn't hammer it
+LINK_CHECK_PER_HOST = int(os.getenv("LINK_CHECK_PER_HOST", "2"))
+# (connect, read) timeouts per request
+LINK_CHECK_TIMEOUT = (float(os.getenv("LINK_CHECK_CONNECT_TIMEOUT", "3.05")), float(os.getenv("LINK_CHECK_READ_TIMEOUT", "10")))
+LINK_CHECK_MAX_REDIRECTS = 5
+# probing private / loopback addresses is only allowed for local testing
+LINK_CHECK_ALLOW_PRIVATE = os.getenv("LINK_CHECK_ALLOW_PRIVATE", "0") == "1"
+USER_AGENT = "fedorco.dev link checker (+https://fedorco.dev)"
+
+# when a link is due again, by outcome
+RECHECK_OK_SEC = 7 * 24 * 60 * 60
+RECHECK_BROKEN_SEC = 24 * 60 * 60
+RECHECK_UNREACHABLE_BASE_SEC = 60 * 60
+# a claimed row is invisible to other workers for this long
+CLAIM_LEASE_SEC = 15 * 60
+
+TASK_NAME = "link_health"
+
+def classify(status_code):
+    if status_code < 400:
+        return "ok"
+    # rate limits and server errors say nothing about the link itself
+    if status_code == 429 or status_code >= 500:
+        return "unreachable"
+    return "broken"
+
+def next_check_delay(status, failures):
+    if status == "ok":
+        delay = RECHECK_OK_SEC
+    elif status == "broken":
+        delay = RECHECK_BROKEN_SEC
+    else:
+        delay = min(RECHECK_UNREACHABLE_BASE_SEC * 2 ** max(failures - 1, 0), RECHECK_OK_SEC)
+    # spread re-checks so links added together are not all due at the same moment
+    return int(delay * random.uniform(0.9, 1.1))
+
+def is_public_host(host):
+    if not host:
+        return False
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except socket.gaierror:
+        return None
+    return all(ipaddress.ip_address(info[4][0].split("%")[0]).is_global for info in infos)
+
+class LinkHealthChecker:
+    """
+    Probes due links concurrently over one pooled, keep-alive HTTP session: HEAD first, GET (without
+    reading the body) when the server does not support HEAD. `allow_private` lets tests point links
+    at a local stand-in server.
+    """
+    def __init__(self, workers=LINK_CHECK_WORKERS, per_host=LINK_CHECK_PER_HOST, timeout=LINK_CHECK_TIMEOUT,
+                 allow_private=LINK_CHECK_ALLOW_PRIVATE, session=None):
+        self.workers = workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.allow_private = allow_private
+        self.session = session or self._make_session(workers)
+        self._host_slots = {}
+        self._lock = threading.Lock()
+        self.stats = {"runs": 0, "probed": 0, "ok": 0, "broken": 0, "unreachable": 0, "last_run": None, "last_run_sec": None}
+
+    @staticmethod
+    def _make_session(workers):
+        session = requests.Session()
+        session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _host_slot(self, host):
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return slot
+
+    def _request(self, method, url):
+        # redirects are followed by hand so every hop goes through the private-address check
+        for _ in range(LINK_CHECK_MAX_REDIRECTS + 1):
+            host = urlsplit(url).hostname
+            if not self.allow_private and not is_public_host(host):
+                return None
+            with self._host_slot(host):
+                response = self.session.request(method, url, timeout=self.timeout, allow_redirects=False, stream=True)
+                response.close()
+            if response.is_redirect and response.headers.get("location"):
+                url = urljoin(url, response.headers["location"])
+                continue
+            return response.status_code
+        return None
+
+    def probe(self, url):
+        """
+        Returns (status, http_code) for one URL: status is "ok", "broken" or "unreachable".
+        """
+        try:
+            code = self._request("HEAD", url)
+            # plenty of servers answer HEAD with 405/501 (or refuse it with 403/404) but serve GET fine
+            if code is not None and code in (403, 404, 405, 501):
+                code = self._request("GET", url)
+        except requests.RequestException:
+            return "unreachable", None
+        if code is None:
+            return "unreachable", None
+        return classify(code), code
+
+    def _claim(self, c, now):
+        c.execute(
+            "SELECT h.iid, h.next_check, h.failures, i.link FROM link_health h JOIN user_items i ON i.iid = h.iid WHERE h.next_check <= ? ORDER BY h.next_check LIMIT ?",
+            (now, LINK_CHECK_BATCH_SIZE)
+        )
+        claimed = []
+        for row in c.fetchall():
+            # compare-and-set so that only one worker takes a given link
+            c.execute("UPDATE link_health SET next_check = ? WHERE iid = ? AND next_check = ?", (now + CLAIM_LEASE_SEC, row["iid"], row["next_check"]))
+            if c.rowcount == 1:
+                claimed.append((row["iid"], row["link"], row["failures"]))
+        return claimed
+
+    def run_once(self):
+        """
+        Probes every due link once. Returns a dict with the number of ok / broken / unreachable links.
+        """
+        started = time.monotonic()
+        result = {"ok": 0, "broken": 0, "unreachable": 0}
+        conn = global_modules.get_db("link_organizer")
+        try:
+            c = conn.cursor()
+            claimed = self._claim(c, int(time.time()))
+            conn.commit()
+            if not claimed:
+                return result
+
+            # users often store the same URL, probe each one only once
+            urls = sorted({link for _, link, _ in claimed})
+            # no DB transaction is held open while probing
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(urls)), thread_name_prefix="link-health") as pool:
+                outcomes = dict(zip(urls, pool.map(self.probe, urls)))
+
+            now = int(time.time())
+            updates = []
+            for iid, link, failures in claimed:
+                status, code = outcomes[link]
+                count = 0 if status == "ok" else failures + 1
+                updates.append((status, code, now, now + next_check_delay(status, count), count, iid))
+                result[status] += 1
+            c.executemany("UPDATE link_health SET status = ?, http_code = ?, checked_at = ?, next_check = ?, failures = ? WHERE iid = ?", updates)
+            conn.commit()
+            logger.info(f"Link health: probed {len(urls)} URLs for {len(claimed)} links, {result['broken']} broken, {result['unreachable']} unreachable")
+        finally:
+            conn.close()
+            with self._lock:
+                self._host_slots.clear()
+                for key, count in result.items():
+                    self.stats[key] += count
+                self.stats["probed"] += sum(result.values())
+                self.stats["runs"] += 1
+                self.stats["last_run"] = int(time.time())
+                self.stats["last_run_sec"] = round(time.monotonic() - started, 3)
+        return result
+
+    def get_stats(self):
+        with self._lock:
+            return dict(self.stats)
+
+checker = LinkHealthChecker()
+
+def start():
+    return background.start_periodic(TASK_NAME, LINK_CHECK_INTERVAL_SEC, checker.run_once, jitter=30)
+
+metrics.register("link_health", checker.get_stats)
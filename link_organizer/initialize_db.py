@@ -1,26 +1,14 @@
-import sqlite3
+import sys
 import os
 
-db_path = os.path.join(os.path.dirname(__file__), "link_organizer.db")
+# allow running as a plain script: python link_organizer/initialize_db.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-conn = sqlite3.connect(db_path)
-c = conn.cursor()
+from assets.migrations import migrate
+from link_organizer.compact import enable_incremental_vacuum
 
-c.execute("""
-    CREATE TABLE IF NOT EXISTS user_items (
-        iid INTEGER PRIMARY KEY AUTOINCREMENT,
-        pid INTEGER DEFAULT 0,
-        uid INTEGER NOT NULL,
-        type TEXT NOT NULL,
-        icon TEXT,
-        name TEXT NOT NULL,
-        link TEXT,
-        color TEXT
-    )
-""")
+applied = migrate("link_organizer")
+# one-off rebuild, kept out of the startup migrations (instant on a new database)
+rebuilt = enable_incremental_vacuum()
 
-
-conn.commit()
-conn.close()
-
-print("Link Organizer DB initialized.")
\ No newline at end of file
+print(f"Link Organizer DB initialized (applied migrations: {applied or 'none'}{', incremental vacuum enabled' if rebuilt else ''}).")
@@ -1,8 +1,12 @@
-import re, ipaddress, validators, unicodedata
+import re, ipaddress, validators, unicodedata, hashlib, os
 from urllib.parse import urlsplit, urlunsplit
+from functools import lru_cache
 
 ALLOWED = {"http", "https"}
 URL_MAX_LEN = 2048
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# distinct URLs remembered per worker by check_url / url_hash
+URL_CACHE_SIZE = int(os.getenv("LORG_URL_CACHE_SIZE", "8192"))
 
 # scheme without colon, e.g., "https//example.com"
 _MISSING_COLON_SCHEME = re.compile(r'^[A-Za-z][A-Za-z0-9+.-]*//')
@@ -17,9 +21,13 @@ def check_url(raw: str) -> str | None:
     if not isinstance(raw, str):
         return None
     s = raw.strip()
-    if not s:
+    if not s or len(s) > URL_MAX_LEN:
         return None
+    return _check_url(s)
 
+# memoized on the stripped input: imports and batches repeat the same URLs, and validators.url is slow
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def _check_url(s: str) -> str | None:
     # Fast-fail on "https//example.com" style typos (missing colon)
     if _MISSING_COLON_SCHEME.match(s):
         return None
@@ -80,6 +88,33 @@ def check_url(raw: str) -> str | None:
 
     return normalized
 
+def canonical_url(url: str) -> str:
+    """
+    Comparison form of a check_url result: no fragment, no default port, "/" for an empty path.
+    """
+    p = urlsplit(url)
+    netloc = p.netloc
+    if p.port is not None and p.port == DEFAULT_PORTS.get(p.scheme):
+        netloc = netloc.rsplit(":", 1)[0]
+    return urlunsplit((p.scheme, netloc, p.path or "/", p.query, ""))
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def url_hash(url: str | None) -> int | None:
+    """
+    64-bit hash of the canonical URL, stored in user_items.url_hash to find duplicates through an index.
+    """
+    if not url:
+        return None
+    digest = hashlib.blake2b(canonical_url(url).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+def url_cache_stats():
+    stats = {}
+    for name, cached in (("check_url", _check_url), ("url_hash", url_hash)):
+        info = cached.cache_info()
+        stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+    return stats
+
 ALLOWED_SEPARATORS = set(" -_.")
 NAME_MAX_LEN = 64
 def normalize_name(raw: str) -> str | None:
@@ -102,4 +137,41 @@ def normalize_name(raw: str) -> str | None:
 
     if not all(ok(c) for c in s):
         return None
-    return s
\ No newline at end of file
+    return s
+
+_NAME_SEPARATORS = re.compile(r"\s+")
+def sanitize_name(raw: str) -> str | None:
+    """
+    Best-effort variant of normalize_name for imported names: disallowed characters become spaces,
+    whitespace is collapsed and the result is cut to NAME_MAX_LEN. None if nothing usable is left.
+    """
+    if not isinstance(raw, str):
+        return None
+    s = unicodedata.normalize("NFC", raw)
+    s = "".join(c if c in ALLOWED_SEPARATORS or unicodedata.category(c)[0] in ("L", "N") else " " for c in s)
+    s = _NAME_SEPARATORS.sub(" ", s).strip()[:NAME_MAX_LEN].strip()
+    return normalize_name(s)
+
+allowed_colors = [
+    "white",
+    "red",
+    "orange",
+    "yellow",
+    "green",
+    "blue",
+    "purple",
+    "pink"
+]
+allowed_icons = [
+    "biology",
+    "chemistry",
+    "coding",
+    "cooking",
+    "geography",
+    "history",
+    "languages",
+    "default",
+    "math",
+    "physics",
+    "socialstudies"
+]
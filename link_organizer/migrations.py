@@ -0,0 +1,179 @@
+from assets.migrations import Migration
+from link_organizer.lorg_modules import url_hash
+
+def backfill_paths(conn):
+    # walk down from every top-level (or orphaned) item, assigning "/<ancestor iids>/<iid>/"; children
+    # must belong to their parent's user, so an item under another user's folder starts its own path
+    conn.execute("""
+        WITH RECURSIVE paths (iid, uid, path) AS (
+            SELECT o.iid, o.uid, '/' || o.iid || '/' FROM user_items o
+            WHERE o.pid = 0 OR NOT EXISTS (SELECT 1 FROM user_items p WHERE p.iid = o.pid AND p.uid = o.uid)
+            UNION
+            SELECT i.iid, i.uid, p.path || i.iid || '/' FROM paths p JOIN user_items i ON i.uid = p.uid AND i.pid = p.iid
+        )
+        UPDATE user_items SET path = paths.path FROM paths WHERE user_items.iid = paths.iid
+    """)
+    # number siblings in their existing (insertion) order
+    conn.execute("""
+        UPDATE user_items SET position = ranked.position FROM (
+            SELECT iid, row_number() OVER (PARTITION BY uid, pid ORDER BY iid) - 1 AS position FROM user_items
+        ) AS ranked
+        WHERE user_items.iid = ranked.iid
+    """)
+
+def backfill_url_hashes(conn):
+    # canonicalization lives in Python, so hashes are computed here and written back in chunks
+    rows = conn.execute("SELECT iid, link FROM user_items WHERE link IS NOT NULL")
+    while True:
+        chunk = rows.fetchmany(1000)
+        if not chunk:
+            break
+        conn.executemany("UPDATE user_items SET url_hash = ? WHERE iid = ?", [(url_hash(link), iid) for iid, link in chunk])
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", [
+        """
+        CREATE TABLE IF NOT EXISTS user_items (
+            iid INTEGER PRIMARY KEY AUTOINCREMENT,
+            pid INTEGER DEFAULT 0,
+            uid INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            icon TEXT,
+            name TEXT NOT NULL,
+            link TEXT,
+            color TEXT
+        )
+        """
+    ]),
+    Migration(2, "index user_items by (uid, pid)", [
+        # get-items: WHERE uid = ? AND pid = ?
+        "CREATE INDEX IF NOT EXISTS idx_user_items_uid_pid ON user_items (uid, pid)"
+    ]),
+    # switching auto_vacuum on takes a full VACUUM that must not run on the startup path; it is done once by
+    # initialize_db.py or "python -m link_organizer.compact --enable-incremental-vacuum" (see compact.py)
+    Migration(3, "incremental vacuum (rebuild moved to link_organizer.compact)", []),
+    Migration(4, "materialized path and sibling position", [
+        "ALTER TABLE user_items ADD COLUMN path TEXT",
+        "ALTER TABLE user_items ADD COLUMN position INTEGER",
+        backfill_paths,
+        # subtree, descendant and move queries: WHERE uid = ? AND path >= prefix AND path < prefix_end
+        "CREATE INDEX IF NOT EXISTS idx_user_items_uid_path ON user_items (uid, path)",
+        # get-items in explicit order; also covers every (uid, pid) lookup
+        "CREATE INDEX IF NOT EXISTS idx_user_items_uid_pid_position ON user_items (uid, pid, position)",
+        "DROP INDEX IF EXISTS idx_user_items_uid_pid",
+        # every insert (add-item, batch, import) gets its path and, unless given, the last position
+        """
+        CREATE TRIGGER IF NOT EXISTS user_items_path_after_insert AFTER INSERT ON user_items
+        BEGIN
+            UPDATE user_items SET
+                path = coalesce((SELECT p.path FROM user_items p WHERE p.uid = NEW.uid AND p.iid = NEW.pid), '/') || NEW.iid || '/',
+                position = coalesce(NEW.position, (
+                    SELECT max(s.position) + 1 FROM user_items s WHERE s.uid = NEW.uid AND s.pid = NEW.pid AND s.iid != NEW.iid
+                ), 0)
+            WHERE iid = NEW.iid;
+        END
+        """
+    ]),
+    Migration(5, "per-user version counters", [
+        # bumped by every write, backs the ETags of get-items / get-tree / breadcrumbs
+        """
+        CREATE TABLE IF NOT EXISTS user_versions (
+            uid INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+        """
+    ]),
+    Migration(6, "full-text index over item names and links", [
+        # external content: the index stores only tokens, rows are read back from user_items.
+        # uid is indexed as a token too, so a search intersects with the user's doclist instead of filtering afterwards.
+        # detail=column drops token positions (searches are single prefix terms, never phrases), roughly halving
+        # the doclists that have to be read; the prefix indexes serve search-as-you-type on 1-3 characters
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS user_items_fts USING fts5(
+            name, link, uid,
+            content = 'user_items', content_rowid = 'iid',
+            prefix = '1 2 3', detail = column, tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS user_items_fts_after_insert AFTER INSERT ON user_items
+        BEGIN
+            INSERT INTO user_items_fts (rowid, name, link, uid) VALUES (NEW.iid, NEW.name, NEW.link, NEW.uid);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS user_items_fts_after_delete AFTER DELETE ON user_items
+        BEGIN
+            INSERT INTO user_items_fts (user_items_fts, rowid, name, link, uid) VALUES ('delete', OLD.iid, OLD.name, OLD.link, OLD.uid);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS user_items_fts_after_update AFTER UPDATE OF name, link, uid ON user_items
+        BEGIN
+            INSERT INTO user_items_fts (user_items_fts, rowid, name, link, uid) VALUES ('delete', OLD.iid, OLD.name, OLD.link, OLD.uid);
+            INSERT INTO user_items_fts (rowid, name, link, uid) VALUES (NEW.iid, NEW.name, NEW.link, NEW.uid);
+        END
+        """,
+        "INSERT INTO user_items_fts (user_items_fts) VALUES ('rebuild')"
+    ]),
+    Migration(7, "constant-time position lookup in the insert trigger", [
+        # max(position) over the (uid, pid, position) index is a single seek as long as nothing else filters it;
+        # the new row's own position is still NULL here and max() skips NULLs, so "iid != NEW.iid" was redundant
+        # and made every insert scan all of its siblings
+        "DROP TRIGGER IF EXISTS user_items_path_after_insert",
+        """
+        CREATE TRIGGER user_items_path_after_insert AFTER INSERT ON user_items
+        BEGIN
+            UPDATE user_items SET
+                path = coalesce((SELECT p.path FROM user_items p WHERE p.uid = NEW.uid AND p.iid = NEW.pid), '/') || NEW.iid || '/',
+                position = coalesce(NEW.position, (
+                    SELECT max(s.position) + 1 FROM user_items s WHERE s.uid = NEW.uid AND s.pid = NEW.pid
+                ), 0)
+            WHERE iid = NEW.iid;
+        END
+        """
+    ]),
+    Migration(8, "canonical URL hash for duplicate detection", [
+        "ALTER TABLE user_items ADD COLUMN url_hash INTEGER",
+        backfill_url_hashes,
+        # duplicates: GROUP BY url_hash WHERE uid = ?; merge: WHERE uid = ? AND url_hash = ?
+        "CREATE INDEX IF NOT EXISTS idx_user_items_uid_url_hash ON user_items (uid, url_hash) WHERE url_hash IS NOT NULL"
+    ]),
+    Migration(9, "link health side table", [
+        # one row per link; next_check = 0 means "never checked", so new and edited links are probed first
+        """
+        CREATE TABLE IF NOT EXISTS link_health (
+            iid INTEGER PRIMARY KEY,
+            status TEXT,
+            http_code INTEGER,
+            checked_at INTEGER,
+            next_check INTEGER NOT NULL DEFAULT 0,
+            failures INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        # the checker's queue: WHERE next_check <= ? ORDER BY next_check
+        "CREATE INDEX IF NOT EXISTS idx_link_health_next_check ON link_health (next_check)",
+        "INSERT OR IGNORE INTO link_health (iid) SELECT iid FROM user_items WHERE type = 'link' AND link IS NOT NULL",
+        """
+        CREATE TRIGGER IF NOT EXISTS link_health_after_insert AFTER INSERT ON user_items
+        WHEN NEW.type = 'link' AND NEW.link IS NOT NULL
+        BEGIN
+            INSERT OR IGNORE INTO link_health (iid) VALUES (NEW.iid);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS link_health_after_update AFTER UPDATE OF link ON user_items
+        WHEN NEW.link IS NOT OLD.link
+        BEGIN
+            DELETE FROM link_health WHERE iid = NEW.iid;
+            INSERT INTO link_health (iid) SELECT NEW.iid WHERE NEW.type = 'link' AND NEW.link IS NOT NULL;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS link_health_after_delete AFTER DELETE ON user_items
+        BEGIN
+            DELETE FROM link_health WHERE iid = OLD.iid;
+        END
+        """
+    ])
+]
@@ -1,40 +1,20 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, Response
 from dotenv import load_dotenv
 from link_organizer.lorg_modules import *
-from assets import global_modules
+from link_organizer import tree, batch, versions, search, transfer, dedup
+from assets import global_modules, metrics
 from functools import wraps
 
 # the base url
 url_base_api = "https://api.fedorco.dev"
 url_base = "https://fedorco.dev"
-allowed_colors = [
-    "white",
-    "red",
-    "orange",
-    "yellow",
-    "green",
-    "blue",
-    "purple",
-    "pink"
-]
-allowed_icons = [
-    "biology",
-    "chemistry",
-    "coding",
-    "cooking",
-    "geography",
-    "history",
-    "languages",
-    "default",
-    "math",
-    "physics",
-    "socialstudies"
-]
 
 load_dotenv(override=True)
 
 link_organizer_bp = Blueprint("link_organizer", __name__)
 
+metrics.register("link_organizer_url_cache", url_cache_stats)
+
 def require_session(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -105,7 +85,19 @@ def add_item(uid):
     conn = global_modules.get_db("link_organizer")
     try:
         c = conn.cursor()
-        c.execute("INSERT INTO user_items (pid, uid, type, icon, name, link, color) VALUES (?, ?, ?, ?, ?, ?, ?)", (int(pid), uid, item_type, icon, name, link, color))
+        # the parent must be one of the user's folders, like in batch and move-item; a pid pointing at
+        # another user's or a not yet existing item would detach the item or close a cycle
+        if pid != 0:
+            c.execute("SELECT type FROM user_items WHERE uid = ? AND iid = ?", (uid, pid))
+            parent = c.fetchone()
+            if parent is None or parent["type"] != "folder":
+                return jsonify({
+                "messagetype": "error",
+                "message": "Parent folder not found.",
+                "display": True
+                }), 404
+        c.execute("INSERT INTO user_items (pid, uid, type, icon, name, link, color, url_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (pid, uid, item_type, icon, name, link, color, url_hash(link)))
+        versions.bump(c, uid)
         conn.commit()
         return jsonify({
             "messagetype": "success",
@@ -125,6 +117,7 @@ def add_item(uid):
 
 @link_organizer_bp.route("/get-items", methods=["GET"])
 @require_session
+@versions.conditional
 def get_items(uid):
     # get pid
     pid = request.args.get("pid", "").strip()
@@ -135,21 +128,114 @@ def get_items(uid):
             "message": "Parent ID is missing.",
             "display": False
             }), 400
-    
+
+    # get the page (cursor from X-Next-Cursor, page size) and the requested columns
+    key = tree.parse_cursor(request.args.get("cursor", "").strip())
+    limit = request.args.get("limit", str(tree.ITEMS_PAGE_SIZE)).strip()
+    fields = tree.parse_item_fields(request.args.get("fields", "").strip())
+    if key is None or fields is None or not limit.isdigit() or not 1 <= int(limit) <= tree.ITEMS_MAX_PAGE_SIZE:
+        return jsonify({
+            "messagetype": "error",
+            "message": "Invalid cursor, limit or fields.",
+            "display": False
+            }), 400
+
     conn = global_modules.get_db("link_organizer")
     try:
-        c = conn.cursor()
-        c.execute("SELECT color, icon, iid, link, name, pid, type FROM user_items WHERE uid = ? AND pid = ? ", (uid, pid))
-        rows = c.fetchall()
-        items = [dict(row) for row in rows]
-        return jsonify(items)
+        rows, next_cursor = tree.query_children(conn.cursor(), uid, int(pid), key, int(limit))
     except Exception as e:
+        conn.close()
         current_app.logger.error(f"DB error occurred while loading items from the DB: {e}")
         return jsonify({
             "messagetype": "error",
             "message": "A database error occurred.",
             "display": True
             }), 500
+
+    def generate():
+        try:
+            yield from tree.stream_items_json(rows, fields)
+        finally:
+            conn.close()
+
+    response = Response(generate(), mimetype="application/json")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+@link_organizer_bp.route("/get-tree", methods=["GET"])
+@require_session
+@versions.conditional
+def get_tree(uid):
+    # get the root (defaults to the top level) and the optional depth limit
+    root = request.args.get("root", "0").strip()
+    depth = request.args.get("depth", "").strip()
+    if not root.isdigit() or (depth and (not depth.isdigit() or int(depth) < 1)):
+        return jsonify({
+            "messagetype": "error",
+            "message": "Invalid root or depth.",
+            "display": False
+            }), 400
+    max_depth = int(depth) if depth else None
+
+    conn = global_modules.get_db("link_organizer")
+    try:
+        rows = tree.query_tree(conn.cursor(), uid, int(root), max_depth)
+    except Exception as e:
+        conn.close()
+        current_app.logger.error(f"DB error occurred while loading the item tree: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
+
+    def generate():
+        # the connection stays checked out until the whole tree has been streamed
+        try:
+            yield from tree.stream_tree_json(rows, max_depth)
+        finally:
+            conn.close()
+
+    return Response(generate(), mimetype="application/json")
+
+@link_organizer_bp.route("/search", methods=["GET"])
+@require_session
+@versions.conditional
+def search_items(uid):
+    # get the query and the page
+    query = request.args.get("q", "").strip()
+    page = request.args.get("page", "1").strip()
+    limit = request.args.get("limit", str(search.SEARCH_PAGE_SIZE)).strip()
+    if not query or not page.isdigit() or int(page) < 1 or not limit.isdigit() or not 1 <= int(limit) <= search.SEARCH_MAX_PAGE_SIZE:
+        return jsonify({
+            "messagetype": "error",
+            "message": "Invalid search query, page or limit.",
+            "display": False
+            }), 400
+
+    conn = global_modules.get_db("link_organizer")
+    try:
+        hits, has_more = search.search(conn.cursor(), uid, query, int(page), int(limit))
+        return jsonify({
+            "results": hits,
+            "page": int(page),
+            "next_page": int(page) + 1 if has_more else None
+            })
+    except search.SearchError as e:
+        current_app.logger.info(f"Unsupported search query {query!r}: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "This search query is not supported.",
+            "display": True
+            }), 400
+    except Exception as e:
+        current_app.logger.error(f"DB error occurred while searching items: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
     finally:
         conn.close()
 
@@ -169,8 +255,10 @@ def delete_item(uid):
     conn = global_modules.get_db("link_organizer")
     try:
         c = conn.cursor()
-        c.execute("DELETE FROM user_items WHERE uid = ? AND iid = ?", (uid, int(iid)))
-        rows_deleted = c.rowcount
+        # deleting a folder removes its whole subtree in the same transaction
+        rows_deleted = tree.delete_subtree(c, uid, int(iid))
+        if rows_deleted:
+            versions.bump(c, uid)
         conn.commit()
 
         if rows_deleted == 0:
@@ -185,6 +273,7 @@ def delete_item(uid):
             "display": True
             }), 200
     except Exception as e:
+        conn.rollback()
         current_app.logger.error(f"DB error occurred while deleting an item from the DB: {e}")
         return jsonify({
             "messagetype": "error",
@@ -256,8 +345,10 @@ def edit_item(uid):
     conn = global_modules.get_db("link_organizer")
     try:
         c = conn.cursor()
-        c.execute("UPDATE user_items SET icon = ?, name = ?, link = ?, color = ? where uid = ? AND iid = ?", (icon, name, link, color, uid, int(iid)))
+        c.execute("UPDATE user_items SET icon = ?, name = ?, link = ?, color = ?, url_hash = ? where uid = ? AND iid = ?", (icon, name, link, color, url_hash(link), uid, int(iid)))
         rows_edited = c.rowcount
+        if rows_edited:
+            versions.bump(c, uid)
         conn.commit()
 
         if rows_edited == 0:
@@ -281,4 +372,333 @@ def edit_item(uid):
             "display": True
             }), 500
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+@link_organizer_bp.route("/move-item", methods=["PATCH"])
+@require_session
+def move_item(uid):
+    # get iid
+    iid = request.args.get("iid", "").strip()
+    iid = iid if iid.isdigit() else ""
+    if not iid:
+        return jsonify({
+            "messagetype": "error",
+            "message": "Item ID is missing.",
+            "display": False
+            }), 400
+
+    # get the target parent and index; either may be left out (keep the parent / append at the end)
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({
+            "messagetype": "error",
+            "message": "Missing JSON payload.",
+            "display": False
+            }), 400
+    pid = data.get("pid")
+    position = data.get("position")
+    if any(value is not None and (isinstance(value, bool) or not isinstance(value, int) or value < 0) for value in (pid, position)):
+        return jsonify({
+            "messagetype": "error",
+            "message": "Invalid parent ID or position.",
+            "display": False
+            }), 400
+
+    conn = global_modules.get_db("link_organizer")
+    try:
+        c = conn.cursor()
+        # shifting siblings and rewriting the subtree paths happen in one transaction
+        c.execute("BEGIN IMMEDIATE")
+        moved = tree.move_item(c, uid, int(iid), pid, position)
+        versions.bump(c, uid)
+        conn.commit()
+        return jsonify({
+            "messagetype": "success",
+            "message": "Item moved successfully.",
+            "display": True,
+            **moved
+            }), 200
+    except tree.MoveError as e:
+        conn.rollback()
+        return jsonify({
+            "messagetype": "error",
+            "message": e.message,
+            "display": True
+            }), e.status
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.error(f"DB error occurred while moving an item: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
+    finally:
+        conn.close()
+
+@link_organizer_bp.route("/breadcrumbs", methods=["GET"])
+@require_session
+@versions.conditional
+def get_breadcrumbs(uid):
+    # get iid
+    iid = request.args.get("iid", "").strip()
+    iid = iid if iid.isdigit() else ""
+    if not iid:
+        return jsonify({
+            "messagetype": "error",
+            "message": "Item ID is missing.",
+            "display": False
+            }), 400
+
+    conn = global_modules.get_db("link_organizer")
+    try:
+        crumbs = tree.breadcrumbs(conn.cursor(), uid, int(iid))
+        if not crumbs:
+            return jsonify({
+            "messagetype": "error",
+            "message": "Item not found.",
+            "display": True
+            }), 404
+        return jsonify(crumbs)
+    except Exception as e:
+        current_app.logger.error(f"DB error occurred while loading breadcrumbs: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
+    finally:
+        conn.close()
+
+@link_organizer_bp.route("/batch", methods=["POST"])
+@require_session
+def apply_batch(uid):
+    # get data
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify({
+            "messagetype": "error",
+            "message": "Missing JSON payload.",
+            "display": False
+            }), 400
+
+    # validate every operation before touching the DB
+    try:
+        ops = batch.parse_ops(data.get("ops"))
+    except batch.BatchError as e:
+        return batch_error_response(e)
+
+    conn = global_modules.get_db("link_organizer")
+    try:
+        c = conn.cursor()
+        # all operations share one transaction and one commit
+        results = batch.apply_ops(c, uid, ops)
+        versions.bump(c, uid)
+        conn.commit()
+        return jsonify({
+            "messagetype": "success",
+            "message": "Batch applied successfully.",
+            "display": True,
+            "results": results
+            }), 200
+    except batch.BatchError as e:
+        conn.rollback()
+        return batch_error_response(e)
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.error(f"DB error occurred while applying a batch: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
+    finally:
+        conn.close()
+
+def batch_error_response(e):
+    message = e.message if e.index is None else f"Operation {e.index + 1}: {e.message}"
+    return jsonify({
+        "messagetype": "error",
+        "message": message,
+        "display": True,
+        "index": e.index
+        }), e.status
+
+@link_organizer_bp.route("/duplicates", methods=["GET"])
+@require_session
+@versions.conditional
+def get_duplicates(uid):
+    conn = global_modules.get_db("link_organizer")
+    try:
+        return jsonify(dedup.find_duplicates(conn.cursor(), uid))
+    except Exception as e:
+        current_app.logger.error(f"DB error occurred while looking for duplicates: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
+    finally:
+        conn.close()
+
+@link_organizer_bp.route("/merge-duplicates", methods=["POST"])
+@require_session
+def merge_duplicates(uid):
+    # keep one given item, or (without "keep") the oldest item of every duplicate group
+    data = request.get_json(silent=True) or {}
+    keep = data.get("keep") if isinstance(data, dict) else None
+    if keep is not None and (isinstance(keep, bool) or not isinstance(keep, int)):
+        return jsonify({
+            "messagetype": "error",
+            "message": "Invalid item ID.",
+            "display": False
+            }), 400
+
+    conn = global_modules.get_db("link_organizer")
+    try:
+        c = conn.cursor()
+        c.execute("BEGIN IMMEDIATE")
+        removed = dedup.merge(c, uid, keep)
+        if removed is None:
+            conn.rollback()
+            return jsonify({
+            "messagetype": "error",
+            "message": "Item not found.",
+            "display": True
+            }), 404
+        if removed:
+            versions.bump(c, uid)
+        conn.commit()
+        return jsonify({
+            "messagetype": "success",
+            "message": f"Removed {len(removed)} duplicate links.",
+            "display": True,
+            "removed": removed
+            }), 200
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.error(f"DB error occurred while merging duplicates: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
+    finally:
+        conn.close()
+
+@link_organizer_bp.route("/broken-links", methods=["GET"])
+@require_session
+def get_broken_links(uid):
+    conn = global_modules.get_db("link_organizer")
+    try:
+        c = conn.cursor()
+        c.execute(
+            "SELECT i.iid, i.pid, i.name, i.link, h.status, h.http_code, h.checked_at FROM user_items i JOIN link_health h ON h.iid = i.iid WHERE i.uid = ? AND h.status IN ('broken', 'unreachable') ORDER BY h.status, i.iid",
+            (uid,)
+        )
+        return jsonify([dict(row) for row in c.fetchall()])
+    except Exception as e:
+        current_app.logger.error(f"DB error occurred while loading broken links: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
+    finally:
+        conn.close()
+
+@link_organizer_bp.route("/import", methods=["POST"])
+@require_session
+def import_items(uid):
+    # get the format and the target folder
+    file_format = request.args.get("format", "html").strip()
+    pid = request.args.get("pid", "0").strip()
+    if file_format not in ("html", "jsonl") or not pid.isdigit():
+        return jsonify({
+            "messagetype": "error",
+            "message": "Invalid format or parent ID.",
+            "display": False
+            }), 400
+
+    conn = global_modules.get_db("link_organizer")
+    upload = None
+    try:
+        upload = transfer.spool(request.stream)
+        c = conn.cursor()
+        # the whole import is one transaction: either every item lands or none does
+        c.execute("BEGIN IMMEDIATE")
+        if int(pid) != 0:
+            c.execute("SELECT type FROM user_items WHERE uid = ? AND iid = ?", (uid, int(pid)))
+            parent = c.fetchone()
+            if parent is None or parent["type"] != "folder":
+                raise transfer.TransferError("Parent folder not found.", 404)
+        importer = transfer.Importer(c, uid, int(pid))
+        parse = transfer.import_html if file_format == "html" else transfer.import_jsonl
+        result = parse(importer, transfer.read_chunks(upload))
+        versions.bump(c, uid)
+        conn.commit()
+        return jsonify({
+            "messagetype": "success",
+            "message": f"Imported {result['imported']} items.",
+            "display": True,
+            **result
+            }), 200
+    except transfer.TransferError as e:
+        conn.rollback()
+        return jsonify({
+            "messagetype": "error",
+            "message": e.message,
+            "display": True
+            }), e.status
+    except Exception as e:
+        conn.rollback()
+        current_app.logger.error(f"DB error occurred while importing items: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
+    finally:
+        if upload is not None:
+            upload.close()
+        conn.close()
+
+@link_organizer_bp.route("/export", methods=["GET"])
+@require_session
+@versions.conditional
+def export_items(uid):
+    # get the format
+    file_format = request.args.get("format", "html").strip()
+    if file_format not in ("html", "jsonl"):
+        return jsonify({
+            "messagetype": "error",
+            "message": "Invalid format.",
+            "display": False
+            }), 400
+
+    conn = global_modules.get_db("link_organizer")
+    try:
+        rows = tree.query_tree(conn.cursor(), uid)
+    except Exception as e:
+        conn.close()
+        current_app.logger.error(f"DB error occurred while exporting items: {e}")
+        return jsonify({
+            "messagetype": "error",
+            "message": "A database error occurred.",
+            "display": True
+            }), 500
+
+    def generate():
+        # rows are serialized as they come off the cursor; the export never sits in memory as a whole
+        try:
+            if file_format == "html":
+                yield from transfer.export_html(rows)
+            else:
+                yield from transfer.export_jsonl(rows)
+        finally:
+            conn.close()
+
+    mimetype = "text/html" if file_format == "html" else "application/x-ndjson"
+    return Response(generate(), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=bookmarks.{file_format}"
+        })
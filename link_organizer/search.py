@@ -0,0 +1,85 @@
+import json, re, os, sqlite3, unicodedata
+
+SEARCH_PAGE_SIZE = int(os.getenv("LORG_SEARCH_PAGE_SIZE", "20"))
+SEARCH_MAX_PAGE_SIZE = 100
+# longer queries are cut off; every extra term is one more doclist to intersect
+SEARCH_MAX_TERMS = 8
+
+# letters and digits only, like the unicode61 tokenizer: "my_file" must become two terms, since a
+# term the tokenizer splits is a phrase, which the detail=column index cannot answer
+_TERM = re.compile(r"[^\W_]+")
+
+class SearchError(Exception):
+    """
+    The query could not be turned into a valid FTS5 match.
+    """
+
+# Ranking: items whose name matches every term first, then shorter (more specific) names.
+# bm25() is deliberately not used: its IDF part counts every row matching each term across all users,
+# which for a common prefix costs far more than the uid-scoped match itself.
+SEARCH_QUERY = """
+    SELECT i.iid, i.pid, i.type, i.icon, i.name, i.link, i.color, i.path
+    FROM user_items_fts f
+    JOIN user_items i ON i.iid = f.rowid
+    WHERE user_items_fts MATCH :match AND i.uid = :uid
+    ORDER BY
+        f.rowid NOT IN (SELECT rowid FROM user_items_fts WHERE user_items_fts MATCH :name_match),
+        length(i.name), i.iid
+    LIMIT :limit OFFSET :offset
+"""
+
+def build_match(raw, uid):
+    """
+    Turns free text into FTS5 queries: every word is a quoted prefix term, ANDed with the user's own
+    uid token. Returns (name or link match, name-only match), or None when there is nothing to search for.
+    """
+    terms = _TERM.findall(unicodedata.normalize("NFC", raw or ""))[:SEARCH_MAX_TERMS]
+    if not terms:
+        return None
+    prefixes = " ".join(f'"{term}"*' for term in terms)
+    owner = f'uid : "{int(uid)}"'
+    return f"{owner} AND {{name link}} : ({prefixes})", f"{owner} AND name : ({prefixes})"
+
+def folder_names(c, uid, paths):
+    # the parent folders of every hit on the page, in one primary-key lookup
+    iids = {int(iid) for path in paths for iid in path.strip("/").split("/")[:-1]}
+    if not iids:
+        return {}
+    c.execute(
+        # CROSS JOIN keeps json_each as the outer loop: one primary-key lookup per folder, not a scan of the user's items
+        "SELECT i.iid, i.name FROM json_each(?) j CROSS JOIN user_items i ON i.iid = j.value WHERE i.uid = ?",
+        (json.dumps(list(iids)), uid)
+    )
+    return {row["iid"]: row["name"] for row in c.fetchall()}
+
+def search(c, uid, raw, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    One page of ranked hits for `raw` among the items of `uid`. Every hit carries "folder",
+    its ancestors from the top level down. Returns (hits, has_more).
+    """
+    matches = build_match(raw, uid)
+    if matches is None:
+        return [], False
+    match, name_match = matches
+    try:
+        c.execute(SEARCH_QUERY, {
+            "match": match, "name_match": name_match, "uid": uid,
+            "limit": page_size + 1, "offset": (page - 1) * page_size
+        })
+        rows = c.fetchall()
+    except sqlite3.OperationalError as e:
+        # FTS5 reports unusable queries as "fts5: ..."; anything else (e.g. a locked DB) is a real error
+        if "fts5" in str(e):
+            raise SearchError(str(e)) from e
+        raise
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    names = folder_names(c, uid, [row["path"] for row in rows])
+    hits = []
+    for row in rows:
+        hit = {column: row[column] for column in ("color", "icon", "iid", "link", "name", "pid", "type")}
+        ancestors = [int(iid) for iid in row["path"].strip("/").split("/")[:-1]]
+        hit["folder"] = [{"iid": iid, "name": names[iid]} for iid in ancestors if iid in names]
+        hits.append(hit)
+    return hits, has_more
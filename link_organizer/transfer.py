@@ -0,0 +1,219 @@
+from link_organizer.lorg_modules import check_url, sanitize_name, url_hash, allowed_colors, allowed_icons
+from link_organizer.tree import buffered
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+import codecs, html, json, tempfile, os
+
+# links buffered before one executemany
+IMPORT_CHUNK_SIZE = int(os.getenv("LORG_IMPORT_CHUNK_SIZE", "500"))
+# per import; larger files are cut off with an error
+IMPORT_MAX_ITEMS = int(os.getenv("LORG_IMPORT_MAX_ITEMS", "100000"))
+IMPORT_MAX_BYTES = int(os.getenv("LORG_IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+# bytes decoded and parsed at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+INSERT_QUERY = "INSERT INTO user_items (pid, uid, type, icon, name, link, color, url_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+class TransferError(Exception):
+    """
+    Rejects an import; `status` is the HTTP status to answer with.
+    """
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+def spool(stream, max_bytes=IMPORT_MAX_BYTES):
+    """
+    Copies an upload to a temporary file (in memory up to 1 MB) before anything is written to the DB,
+    so a slow client never holds the write lock. Returns the rewound file.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    size = 0
+    for chunk in iter(lambda: stream.read(READ_CHUNK_SIZE), b""):
+        size += len(chunk)
+        if size > max_bytes:
+            spooled.close()
+            raise TransferError(f"The file is too large (max {max_bytes // (1024 * 1024)} MB).", 413)
+        spooled.write(chunk)
+    spooled.seek(0)
+    return spooled
+
+def read_chunks(file):
+    return iter(lambda: file.read(READ_CHUNK_SIZE), b"")
+
+class Importer:
+    """
+    Inserts imported items on cursor `c` (the caller commits). Folders are inserted one by one because
+    their children need the new iid; runs of links are buffered and written IMPORT_CHUNK_SIZE at a time.
+    """
+    def __init__(self, c, uid, root_pid=0):
+        self.c = c
+        self.uid = uid
+        self.root_pid = root_pid
+        self.links = []
+        self.imported = 0
+        self.skipped = 0
+
+    def count(self):
+        if self.imported >= IMPORT_MAX_ITEMS:
+            raise TransferError(f"Too many items (max {IMPORT_MAX_ITEMS}).")
+        self.imported += 1
+
+    def folder(self, name, pid, color="white", icon="default"):
+        name = sanitize_name(name) or "Imported folder"
+        self.count()
+        # earlier links first, so positions follow the order of the file
+        self.flush()
+        self.c.execute(INSERT_QUERY, (pid, self.uid, "folder", icon, name, None, color, None))
+        return self.c.lastrowid
+
+    def link(self, name, url, pid, color="white", icon="default"):
+        url = check_url(url)
+        if not url:
+            self.skipped += 1
+            return
+        name = sanitize_name(name) or sanitize_name(urlsplit(url).hostname) or "Imported link"
+        self.count()
+        self.links.append((pid, self.uid, "link", icon, name, url, color, url_hash(url)))
+        if len(self.links) >= IMPORT_CHUNK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.links:
+            self.c.executemany(INSERT_QUERY, self.links)
+            self.links = []
+
+    def result(self):
+        self.flush()
+        return {"imported": self.imported, "skipped": self.skipped}
+
+class NetscapeBookmarkParser(HTMLParser):
+    """
+    Incremental parser for the Netscape bookmark file every browser exports:
+    <DT><H3>folder</H3> followed by its <DL> of children, and <DT><A HREF="...">link</A>.
+    """
+    def __init__(self, importer):
+        super().__init__()
+        self.importer = importer
+        self.parents = [importer.root_pid]
+        self.pending_folder = None    # folder whose <DL> has not started yet
+        self.capture = None           # "h3" / "a" while collecting their text
+        self.text = []
+        self.href = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "dl":
+            self.parents.append(self.pending_folder if self.pending_folder is not None else self.parents[-1])
+            self.pending_folder = None
+        elif tag in ("h3", "a"):
+            self.capture = tag
+            self.text = []
+            self.href = dict(attrs).get("href") if tag == "a" else None
+
+    def handle_endtag(self, tag):
+        if tag == "dl":
+            if len(self.parents) > 1:
+                self.parents.pop()
+            self.pending_folder = None
+        elif tag == self.capture:
+            name = "".join(self.text)
+            if tag == "h3":
+                self.pending_folder = self.importer.folder(name, self.parents[-1])
+            else:
+                self.importer.link(name, self.href, self.parents[-1])
+            self.capture = None
+
+    def handle_data(self, data):
+        if self.capture:
+            self.text.append(data)
+
+def import_html(importer, chunks):
+    """
+    Feeds byte chunks of a bookmark file through the parser without holding the whole file.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parser = NetscapeBookmarkParser(importer)
+    for chunk in chunks:
+        parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
+    return importer.result()
+
+def read_lines(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    rest = ""
+    for chunk in chunks:
+        lines = (rest + decoder.decode(chunk)).split("\n")
+        rest = lines.pop()
+        yield from lines
+    rest += decoder.decode(b"", final=True)
+    if rest:
+        yield rest
+
+def import_jsonl(importer, chunks):
+    """
+    One JSON object per line, as written by export_jsonl: {"id", "parent", "type", "name", "link", ...}.
+    Parents must come before their children; unknown parents fall back to the import root.
+    """
+    ids = {}
+    for number, line in enumerate(read_lines(chunks), 1):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise TransferError(f"Line {number} is not valid JSON.")
+        if not isinstance(item, dict) or item.get("type") not in ("link", "folder"):
+            importer.skipped += 1
+            continue
+        # ids are looked up in a dict, so lists and objects cannot be ids
+        if not all(value is None or isinstance(value, (str, int, float)) for value in (item.get("id"), item.get("parent"))):
+            raise TransferError(f"Line {number} has an invalid id or parent.")
+        pid = ids.get(item.get("parent"), importer.root_pid)
+        color = item.get("color") if item.get("color") in allowed_colors else "white"
+        icon = item.get("icon") if item.get("icon") in allowed_icons else "default"
+        if item["type"] == "folder":
+            ids[item.get("id")] = importer.folder(item.get("name"), pid, color, icon)
+        else:
+            importer.link(item.get("name"), item.get("link"), pid, color, icon)
+    return importer.result()
+
+def export_html(rows):
+    """
+    Depth-first tree rows (tree.query_tree) as a Netscape bookmark file, streamed.
+    """
+    def parts():
+        yield (
+            "<!DOCTYPE NETSCAPE-Bookmark-file-1>\n"
+            '<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">\n'
+            "<TITLE>Bookmarks</TITLE>\n<H1>Bookmarks</H1>\n<DL><p>\n"
+        )
+        open_depths = []
+        for row in rows:
+            depth = row["depth"]
+            while open_depths and open_depths[-1] >= depth:
+                yield "    " * open_depths.pop() + "</DL><p>\n"
+            indent = "    " * depth
+            name = html.escape(row["name"])
+            if row["type"] == "folder":
+                yield f"{indent}<DT><H3>{name}</H3>\n{indent}<DL><p>\n"
+                open_depths.append(depth)
+            else:
+                yield f'{indent}<DT><A HREF="{html.escape(row["link"] or "")}">{name}</A>\n'
+        while open_depths:
+            yield "    " * open_depths.pop() + "</DL><p>\n"
+        yield "</DL><p>\n"
+    return buffered(parts())
+
+def export_jsonl(rows):
+    """
+    Depth-first tree rows as JSON Lines; parents always precede their children.
+    """
+    return buffered(
+        json.dumps({
+            "id": row["iid"], "parent": row["pid"], "type": row["type"], "name": row["name"],
+            "link": row["link"], "color": row["color"], "icon": row["icon"]
+        }, ensure_ascii=False) + "\n"
+        for row in rows
+    )
@@ -0,0 +1,270 @@
+from link_organizer import versions
+import json, re, os
+
+ITEM_COLUMNS = ("color", "icon", "iid", "link", "name", "pid", "position", "type")
+# flush the streamed JSON to the client roughly every this many characters
+STREAM_CHUNK_SIZE = 16 * 1024
+# get-items page size when the client does not ask for one, and the largest it may ask for
+ITEMS_PAGE_SIZE = int(os.getenv("LORG_ITEMS_PAGE_SIZE", "500"))
+ITEMS_MAX_PAGE_SIZE = int(os.getenv("LORG_ITEMS_MAX_PAGE_SIZE", "5000"))
+
+# Depth-first walk of a user's items below `root`, in one recursive query. sort_key is the
+# zero-padded (position, iid) path, so ORDER BY sort_key lists every folder directly followed by its subtree.
+# A child is only followed if its materialized path lies below its parent's, so a pid cycle left in old
+# data ends the walk instead of recursing forever (a prefix test rather than a path range, which would
+# pull the planner off the (uid, pid, position) index).
+TREE_QUERY = """
+    WITH RECURSIVE tree (iid, pid, position, type, icon, name, link, color, path, depth, sort_key) AS (
+        SELECT iid, pid, position, type, icon, name, link, color, path, 1, printf('%010d%010d', position, iid)
+        FROM user_items
+        WHERE uid = :uid AND pid = :root
+        UNION ALL
+        SELECT i.iid, i.pid, i.position, i.type, i.icon, i.name, i.link, i.color, i.path, t.depth + 1,
+            t.sort_key || '/' || printf('%010d%010d', i.position, i.iid)
+        FROM tree t JOIN user_items i ON i.uid = :uid AND i.pid = t.iid
+        WHERE t.type = 'folder' AND (:max_depth IS NULL OR t.depth < :max_depth)
+            AND substr(i.path, 1, length(t.path)) = t.path AND i.path != t.path
+    )
+    SELECT color, icon, iid, link, name, pid, position, type, depth FROM tree ORDER BY sort_key
+"""
+
+def query_tree(c, uid, root=0, max_depth=None):
+    """
+    Executes the tree query on cursor `c`; iterate the cursor for rows in depth-first order.
+    """
+    c.execute(TREE_QUERY, {"uid": uid, "root": root, "max_depth": max_depth})
+    return c
+
+def stream_tree_json(rows, max_depth=None):
+    """
+    Turns depth-first rows into a nested JSON array without building the tree in memory.
+    Folders get a "children" array; folders at the depth limit get "children": null (not loaded).
+    """
+    buffer = ["["]
+    size = 1
+    open_depths = []    # depths of folders whose "children" array is still open
+    first = True
+    for row in rows:
+        depth = row["depth"]
+        while open_depths and open_depths[-1] >= depth:
+            open_depths.pop()
+            buffer.append("]}")
+            first = False
+        if not first:
+            buffer.append(",")
+        item = {column: row[column] for column in ITEM_COLUMNS}
+        if row["type"] == "folder" and (max_depth is None or depth < max_depth):
+            buffer.append(json.dumps(item)[:-1] + ',"children":[')
+            open_depths.append(depth)
+            first = True
+        else:
+            if row["type"] == "folder":
+                item["children"] = None
+            buffer.append(json.dumps(item))
+            first = False
+        size += len(buffer[-1])
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    buffer.append("]}" * len(open_depths))
+    buffer.append("]")
+    yield "".join(buffer)
+
+def buffered(parts):
+    # joins small pieces into chunks of roughly STREAM_CHUNK_SIZE characters
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= STREAM_CHUNK_SIZE:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
+
+# Pages of a folder's children are keyset ranges on (position, iid), the tail of the (uid, pid, position)
+# index (iid is the rowid), so page 100 costs the same as page 1. A cursor is the key of a page's first row.
+CHILDREN_QUERY = """
+    SELECT color, icon, iid, link, name, pid, position, type FROM user_items
+    WHERE uid = :uid AND pid = :pid AND (position, iid) >= (:position, :iid)
+    ORDER BY position, iid LIMIT :limit
+"""
+# key of the first row after the page, read from the index alone
+NEXT_KEY_QUERY = """
+    SELECT position, iid FROM user_items
+    WHERE uid = :uid AND pid = :pid AND (position, iid) >= (:position, :iid)
+    ORDER BY position, iid LIMIT 1 OFFSET :limit
+"""
+FIRST_KEY = (-2 ** 63, 0)
+
+_CURSOR = re.compile(r"^(-?\d{1,19})\.(\d{1,19})$")
+def parse_cursor(raw):
+    """
+    "<position>.<iid>" -> (position, iid); FIRST_KEY for an empty cursor, None if malformed.
+    """
+    if not raw:
+        return FIRST_KEY
+    match = _CURSOR.match(raw)
+    return (int(match[1]), int(match[2])) if match else None
+
+def parse_item_fields(raw):
+    """
+    "name,link" -> ("name", "link"); every column for an empty value, None for an unknown column.
+    """
+    if not raw:
+        return ITEM_COLUMNS
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(",")))
+    return fields if all(field in ITEM_COLUMNS for field in fields) else None
+
+def query_children(c, uid, pid, key=FIRST_KEY, limit=ITEMS_PAGE_SIZE):
+    """
+    Executes the page of `pid`'s children starting at `key` on cursor `c`. Returns the cursor to
+    iterate and the cursor string of the next page (None on the last page).
+    """
+    params = {"uid": uid, "pid": pid, "position": key[0], "iid": key[1], "limit": limit}
+    c.execute(NEXT_KEY_QUERY, params)
+    next_key = c.fetchone()
+    c.execute(CHILDREN_QUERY, params)
+    return c, f"{next_key['position']}.{next_key['iid']}" if next_key else None
+
+def stream_items_json(rows, fields=ITEM_COLUMNS):
+    """
+    Rows as a JSON array of objects with only `fields`, serialized one row at a time.
+    """
+    def parts():
+        yield "["
+        for number, row in enumerate(rows):
+            yield ("," if number else "") + json.dumps({field: row[field] for field in fields})
+        yield "]"
+    return buffered(parts())
+
+# Items are stored with a materialized path "/<ancestor iids>/<iid>/", so a subtree is one range
+# on the (uid, path) index: path >= "/1/7/" AND path < "/1/70" ("0" sorts right after "/").
+def path_end(path):
+    return path[:-1] + "0"
+
+# The given items plus everything below them, in one statement.
+DELETE_SUBTREES_QUERY = """
+    DELETE FROM user_items WHERE iid IN (
+        SELECT d.iid FROM json_each(:iids) j
+        CROSS JOIN user_items r ON r.iid = j.value AND r.uid = :uid
+        JOIN user_items d ON d.uid = r.uid AND d.path >= r.path AND d.path < substr(r.path, 1, length(r.path) - 1) || '0'
+    )
+    RETURNING iid
+"""
+
+# Root-to-item chain of folders, read by splitting the item's path into iids.
+BREADCRUMBS_QUERY = """
+    SELECT a.iid, a.name, a.type, a.icon, a.color
+    FROM user_items i
+    JOIN json_each('[' || replace(trim(i.path, '/'), '/', ',') || ']') j
+    JOIN user_items a ON a.iid = j.value AND a.uid = i.uid
+    WHERE i.uid = :uid AND i.iid = :iid
+    ORDER BY j.key
+"""
+
+class MoveError(Exception):
+    """
+    A move that cannot be applied; `status` is the HTTP status to answer with.
+    """
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+# Items whose parent folder no longer exists, plus their descendants. The anchor deliberately
+# scans the whole table (maintenance only) and is capped per batch to keep write locks short.
+DELETE_ORPHANS_QUERY = """
+    WITH RECURSIVE orphaned (iid, uid) AS (
+        SELECT * FROM (
+            SELECT o.iid, o.uid FROM user_items o /* allow-full-scan */
+            WHERE o.pid != 0 AND NOT EXISTS (SELECT 1 FROM user_items p WHERE p.iid = o.pid AND p.uid = o.uid)
+            LIMIT :batch_size
+        )
+        UNION
+        SELECT i.iid, i.uid FROM orphaned o JOIN user_items i ON i.uid = o.uid AND i.pid = o.iid
+    )
+    DELETE FROM user_items WHERE iid IN (SELECT iid FROM orphaned)
+    RETURNING uid
+"""
+
+def delete_subtrees(c, uid, iids):
+    """
+    Deletes items `iids` of `uid` and, for folders, their whole subtrees. Returns the deleted iids.
+    """
+    c.execute(DELETE_SUBTREES_QUERY, {"uid": uid, "iids": json.dumps(list(iids))})
+    return [row[0] for row in c.fetchall()]
+
+def delete_subtree(c, uid, iid):
+    """
+    Deletes item `iid` of `uid` and, for folders, its whole subtree. Returns the number of deleted rows.
+    """
+    return len(delete_subtrees(c, uid, [iid]))
+
+def breadcrumbs(c, uid, iid):
+    """
+    The item and its ancestors, top-level folder first. Empty if the item does not exist.
+    """
+    c.execute(BREADCRUMBS_QUERY, {"uid": uid, "iid": iid})
+    return [dict(row) for row in c.fetchall()]
+
+def move_item(c, uid, iid, pid=None, position=None):
+    """
+    Moves item `iid` under folder `pid` (None = keep the parent) at sibling index `position`
+    (None = last), shifting the siblings around it and rewriting the paths of the whole subtree.
+    """
+    c.execute("SELECT pid, position, path FROM user_items WHERE uid = ? AND iid = ?", (uid, iid))
+    item = c.fetchone()
+    if item is None:
+        raise MoveError("Item not found.", 404)
+    old_pid, old_position, old_path = item["pid"], item["position"], item["path"]
+    pid = old_pid if pid is None else pid
+
+    parent_path = "/"
+    if pid != 0:
+        c.execute("SELECT type, path FROM user_items WHERE uid = ? AND iid = ?", (uid, pid))
+        parent = c.fetchone()
+        if parent is None:
+            raise MoveError("Parent item not found.", 404)
+        if parent["type"] != "folder":
+            raise MoveError("Parent item is not a folder.")
+        # the target must not lie inside the moved subtree
+        if parent["path"].startswith(old_path):
+            raise MoveError("An item cannot be moved into itself.", 409)
+        parent_path = parent["path"]
+
+    # close the gap at the old place, then clamp the target index to the new sibling list
+    c.execute("UPDATE user_items SET position = position - 1 WHERE uid = ? AND pid = ? AND position > ?", (uid, old_pid, old_position))
+    c.execute("SELECT max(position) FROM user_items WHERE uid = ? AND pid = ? AND iid != ?", (uid, pid, iid))
+    last = c.fetchone()[0]
+    end = 0 if last is None else last + 1
+    position = end if position is None else max(0, min(position, end))
+    c.execute("UPDATE user_items SET position = position + 1 WHERE uid = ? AND pid = ? AND position >= ? AND iid != ?", (uid, pid, position, iid))
+    c.execute("UPDATE user_items SET pid = ?, position = ? WHERE uid = ? AND iid = ?", (pid, position, uid, iid))
+
+    new_path = f"{parent_path}{iid}/"
+    if new_path != old_path:
+        c.execute(
+            "UPDATE user_items SET path = ? || substr(path, ?) WHERE uid = ? AND path >= ? AND path < ?",
+            (new_path, len(old_path) + 1, uid, old_path, path_end(old_path))
+        )
+    return {"iid": iid, "pid": pid, "position": position}
+
+def purge_orphans(conn, batch_size=1000):
+    """
+    Deletes orphaned subtrees batch by batch, committing after each. Returns the number of deleted rows.
+    """
+    purged = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        uids = [row[0] for row in conn.execute(DELETE_ORPHANS_QUERY, {"batch_size": batch_size})]
+        deleted = len(uids)
+        # orphans are visible through get-items?pid=<missing parent>, so cached copies must be refreshed
+        versions.bump_many(conn, uids)
+        conn.commit()
+        purged += deleted
+        if deleted == 0:
+            return purged
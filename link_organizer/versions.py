@@ -0,0 +1,48 @@
+from flask import request, make_response
+from assets import global_modules
+from functools import wraps
+
+# Every write endpoint bumps the user's version in the same transaction as the change, so
+# "has anything of this user changed?" is a single primary-key lookup.
+BUMP_QUERY = """
+    INSERT INTO user_versions (uid, version) VALUES (?, 1)
+    ON CONFLICT (uid) DO UPDATE SET version = version + 1
+"""
+
+def bump(c, uid):
+    c.execute(BUMP_QUERY, (uid,))
+
+def bump_many(c, uids):
+    c.executemany(BUMP_QUERY, [(uid,) for uid in set(uids)])
+
+def current(c, uid):
+    c.execute("SELECT version FROM user_versions WHERE uid = ?", (uid,))
+    row = c.fetchone()
+    return row[0] if row else 0
+
+def conditional(f):
+    """
+    ETag support for read endpoints taking `uid`: answers If-None-Match with a 304 from the user's version
+    alone, otherwise tags the response. The version is read before the data, so a concurrent write
+    can only make the tag older than the body (the next poll then fetches again), never newer.
+    """
+    @wraps(f)
+    def decorated_function(uid, *args, **kwargs):
+        conn = global_modules.get_db("link_organizer")
+        try:
+            # versions are per user and start at 0, so without the uid two accounts in one browser share tags
+            etag = f"u{int(uid)}-v{current(conn.cursor(), uid)}"
+        finally:
+            conn.close()
+        if request.if_none_match.contains(etag):
+            response = make_response("", 304)
+        else:
+            response = make_response(f(uid, *args, **kwargs))
+            if response.status_code != 200:
+                return response
+        response.set_etag(etag)
+        # the body depends on the session cookie; make browsers revalidate instead of reusing it blindly
+        response.headers["Cache-Control"] = "private, no-cache"
+        response.vary.add("Cookie")
+        return response
+    return decorated_function
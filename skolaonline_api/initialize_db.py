@@ -1,20 +1,11 @@
-import sqlite3
+import sys
 import os
 
-db_path = os.path.join(os.path.dirname(__file__), "skolaonline_api_cache.db")
+# allow running as a plain script: python skolaonline_api/initialize_db.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-conn = sqlite3.connect(db_path)
-c = conn.cursor()
+from assets.migrations import migrate
 
-c.execute("""
-    CREATE TABLE IF NOT EXISTS cached_classes (
-        timestamp INTEGER,
-        subject TEXT,
-        classroom TEXT
-    )
-""")
+applied = migrate("skolaonline_api")
 
-conn.commit()
-conn.close()
-
-print("SkolaOnline API cache DB initialized.")
\ No newline at end of file
+print(f"SkolaOnline API cache DB initialized (applied migrations: {applied or 'none'}).")
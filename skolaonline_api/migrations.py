@@ -0,0 +1,35 @@
+from assets.migrations import Migration
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", [
+        """
+        CREATE TABLE IF NOT EXISTS cached_classes (
+            timestamp INTEGER,
+            subject TEXT,
+            classroom TEXT
+        )
+        """
+    ]),
+    Migration(2, "index cached_classes by timestamp", [
+        # fetch_next_class_db: WHERE timestamp > ? ORDER BY timestamp LIMIT 1
+        "CREATE INDEX IF NOT EXISTS idx_cached_classes_timestamp ON cached_classes (timestamp)"
+    ]),
+    Migration(3, "leases and status for scheduled cache pre-warming", [
+        # assets/leases.py / assets/prewarm.py
+        """
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires REAL NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS prewarm_status (
+            job TEXT PRIMARY KEY,
+            last_success REAL,
+            last_failure REAL,
+            last_error TEXT
+        )
+        """
+    ])
+]
@@ -1,7 +1,8 @@
 from flask import Blueprint, request, jsonify, current_app
 from dotenv import load_dotenv
+from assets import global_modules
 import os, sqlite3
-from skolaonline_api.main import get_today_lessons
+from skolaonline_api.main import get_today_lessons, class_times
 from time import time
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
@@ -11,12 +12,15 @@ load_dotenv(override=True)
 EXPECTED_API_KEY = os.getenv("API_KEY")
 if not EXPECTED_API_KEY:
     raise ValueError("API_KEY not found in environment variables")
-db_path = os.path.join(os.path.dirname(__file__), "skolaonline_api_cache.db")
+
+# refresh ahead of the first caller of the day and shortly before each lesson change (substitutions)
+PREWARM_LEAD_MIN = int(os.getenv("SKOLAONLINE_PREWARM_LEAD_MIN", "5"))
+PREWARM_TIMES = os.getenv("SKOLAONLINE_PREWARM_TIMES") or ",".join(
+    ["05:30"] + [(datetime.strptime(t, "%H:%M") - timedelta(minutes=PREWARM_LEAD_MIN)).strftime("%H:%M") for t in class_times]
+)
 
 def get_db():
-    conn = sqlite3.connect(db_path, timeout=5)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return global_modules.get_db("skolaonline_api")
 
 def get_next_midnight_timestamp():
     now = datetime.now(ZoneInfo("Europe/Prague"))
@@ -24,6 +28,31 @@ def get_next_midnight_timestamp():
     timestamp = int(next_midnight.timestamp())
     return timestamp
 
+def get_last_midnight_timestamp():
+    now = datetime.now(ZoneInfo("Europe/Prague"))
+    return int(now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+def refresh_classes(c):
+    """
+    Replaces today's cached lessons with a fresh scrape (the caller commits).
+    """
+    classes_new = get_today_lessons()
+    classes_new.append({
+        "subject": "---",
+        "Učebna": "---",
+        "timestamp": get_next_midnight_timestamp()
+    })
+    c.execute("DELETE FROM cached_classes WHERE timestamp >= ?", (get_last_midnight_timestamp(),))
+    c.executemany(
+        "INSERT INTO cached_classes (subject, classroom, timestamp) VALUES (?, ?, ?)",
+        [(lesson["subject"], lesson["Učebna"], lesson["timestamp"]) for lesson in classes_new]
+    )
+
+def warm_cache(conn):
+    # scheduled by assets/prewarm.py
+    refresh_classes(conn.cursor())
+    conn.commit()
+
 def fetch_next_class_db(time_curr, c):
     c.execute("SELECT * FROM cached_classes WHERE timestamp > ? ORDER BY timestamp ASC LIMIT 1", (time_curr,))
     row = c.fetchone()
@@ -52,17 +81,7 @@ def get_next_class():
             return jsonify(next_class)
         else:
             current_app.logger.info("Cache miss - fetching new data")
-            classes_new = get_today_lessons()
-            classes_new.append({
-                "subject": "---",
-                "Učebna": "---",
-                "timestamp": get_next_midnight_timestamp()
-            })
-            for lesson in classes_new:
-                c.execute(
-                    "INSERT INTO cached_classes (subject, classroom, timestamp) VALUES (?, ?, ?)",
-                    (lesson["subject"], lesson["Učebna"], lesson["timestamp"])
-                )
+            refresh_classes(c)
             conn.commit()
             next_class = fetch_next_class_db(time_curr, c)
             if next_class:
@@ -1,20 +1,11 @@
-import sqlite3
+import sys
 import os
 
-db_path = os.path.join(os.path.dirname(__file__), "strava_api_cache.db")
+# allow running as a plain script: python strava_api/initialize_db.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-conn = sqlite3.connect(db_path)
-c = conn.cursor()
+from assets.migrations import migrate
 
-c.execute("""
-    CREATE TABLE IF NOT EXISTS cached_meals (
-        date TEXT PRIMARY KEY,
-        meal_num TEXT NOT NULL,
-        meal_name TEXT NOT NULL
-    )
-""")
+applied = migrate("strava_api")
 
-conn.commit()
-conn.close()
-
-print("Strava API cache DB initialized.")
\ No newline at end of file
+print(f"Strava API cache DB initialized (applied migrations: {applied or 'none'}).")
@@ -1,8 +1,10 @@
-import requests, sys, os
-from json import loads
+import requests, sys, os, json, threading, time
+from requests.adapters import HTTPAdapter
+from collections import deque
 from dotenv import load_dotenv
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from assets import metrics
 
 sys.stdout.reconfigure(encoding='utf-8')
 load_dotenv()
@@ -12,6 +14,13 @@ PASSWORD = os.getenv("PASSWORD")
 CANTEEN_NUM = os.getenv("CANTEEN_NUM")
 LOGIN_URL = "https://app.strava.cz/api/login"
 DATA_URL = 'https://app.strava.cz/api/objednavky'
+# (connect, read) timeouts for app.strava.cz
+STRAVA_TIMEOUT = (float(os.getenv("STRAVA_CONNECT_TIMEOUT", "3.05")), float(os.getenv("STRAVA_READ_TIMEOUT", "10")))
+# a sid is reused for this long at most; the API may also reject it earlier
+STRAVA_SID_TTL_SEC = int(os.getenv("STRAVA_SID_TTL_SEC", "1200"))
+LATENCY_SAMPLES = 256
+# account served with the shared API_KEY; the legacy USERNAME / PASSWORD / CANTEEN_NUM account has this name
+DEFAULT_ACCOUNT = os.getenv("STRAVA_DEFAULT_ACCOUNT", "default")
 
 login_headers = {
     "accept": "*/*",
@@ -28,49 +37,186 @@ login_headers = {
     "sec-fetch-site": "same-origin",
     "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/135.0.0.0 Safari/537.36"
 }
-login_data = {
-    "cislo": CANTEEN_NUM,
-    "jmeno": USERNAME,
-    "heslo": PASSWORD,
-    "zustatPrihlasen": False,
-    "environment": "W",
-    "lang": "EN"
-}
 
-def parser(src):
-    data_today = src["table0"]
-    selected_meal = [meal for meal in data_today if meal["pocet"] != 0]
-    
+NO_MEAL = {"meal_num": "------", "meal_name": "No meal ordered."}
+
+def parse_day(rows):
+    """
+    One `tableN` of the objednavky response (every meal offered that day) -> the day's cache entry:
+    display date, ISO date, the ordered meal (or NO_MEAL) and the whole menu. None if it has no date.
+    """
+    try:
+        day = datetime.strptime(rows[0]["datum"].replace(" ", ""), "%d.%m.%Y")
+    except (IndexError, KeyError, AttributeError, ValueError):
+        return None
+    menu = [
+        {"meal_num": row.get("druh_popis") or "", "meal_name": row.get("nazev") or "", "ordered": bool(row.get("pocet"))}
+        for row in rows
+    ]
+    ordered = [meal for meal in menu if meal["ordered"]]
     return {
-        "date": selected_meal[0]["datum"] or "",
-        "meal_num": selected_meal[0]["druh_popis"] or "",
-        "meal_name": selected_meal[0]["nazev"] or ""
+        "date": day.strftime("%d. %m. %Y"),
+        "day": day.strftime("%Y-%m-%d"),
+        **({"meal_num": ordered[0]["meal_num"], "meal_name": ordered[0]["meal_name"]} if ordered else NO_MEAL),
+        "menu": menu
     }
 
-def get_data_strava(login_data = login_data, login_headers = login_headers):
-    response = requests.post(LOGIN_URL, headers = login_headers, json = login_data)
-    login_data = response.json()
+def parser(src):
+    """
+    Every day in the objednavky response (table0, table1, ...), in date order.
+    """
+    days = [parse_day(rows) for key, rows in src.items() if key.startswith("table") and isinstance(rows, list)]
+    return sorted((day for day in days if day), key=lambda day: day["day"])
+
+class StravaError(Exception):
+    pass
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))], 2)
+
+class StravaClient:
+    """
+    One canteen account over a pooled, keep-alive session. The sid/s5url pair from a login is reused
+    until STRAVA_SID_TTL_SEC passes or the API rejects it, and only then does the client log in again.
+    `login_url` / `data_url` can point at a local stand-in server in tests.
+    """
+    def __init__(self, canteen=CANTEEN_NUM, username=USERNAME, password=PASSWORD, timeout=STRAVA_TIMEOUT,
+                 login_url=LOGIN_URL, data_url=DATA_URL, session=None):
+        self.canteen = canteen
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.login_url = login_url
+        self.data_url = data_url
+        self.session = session or self._make_session()
+        self._sid = None            # (sid, s5url, expires at)
+        self._login_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._latencies = {"login": deque(maxlen=LATENCY_SAMPLES), "fetch": deque(maxlen=LATENCY_SAMPLES)}
+        self.stats = {"logins": 0, "relogins": 0, "fetches": 0, "errors": 0}
+
+    @staticmethod
+    def _make_session():
+        session = requests.Session()
+        session.headers.update(login_headers)
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+        session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=4, max_retries=0))
+        return session
 
-    sid = login_data['sid']
-    s5url = login_data["s5url"]
+    def _timed(self, kind, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, timeout=self.timeout, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._latencies[kind].append(elapsed_ms)
 
-    data = f'{"{"}"cislo":"{CANTEEN_NUM}","sid":"{sid}","s5url":"{s5url}","lang":"EN","konto":0,"podminka":"","ignoreCert":"false"{"}"}'
-    response = requests.post(DATA_URL, data = data)
+    def _login(self):
+        response = self._timed("login", self.session.post, self.login_url, json={
+            "cislo": self.canteen,
+            "jmeno": self.username,
+            "heslo": self.password,
+            "zustatPrihlasen": False,
+            "environment": "W",
+            "lang": "EN"
+        })
+        body = response.json() if response.status_code == 200 else {}
+        if not body.get("sid") or not body.get("s5url"):
+            raise StravaError(f"Strava login failed with status {response.status_code}")
+        with self._lock:
+            self.stats["logins"] += 1
+        return body["sid"], body["s5url"], time.monotonic() + STRAVA_SID_TTL_SEC
 
-    raw_src = loads(response.text)
+    def _credentials(self, rejected=None):
+        # one login at a time; a caller whose sid was rejected only logs in if nobody else already has
+        with self._login_lock:
+            if self._sid is None or self._sid[:2] == rejected or self._sid[2] <= time.monotonic():
+                self._sid = None
+                self._sid = self._login()
+            return self._sid[:2]
 
-    return raw_src
+    def _fetch(self, sid, s5url):
+        data = json.dumps({"cislo": self.canteen, "sid": sid, "s5url": s5url, "lang": "EN", "konto": 0, "podminka": "", "ignoreCert": "false"})
+        response = self._timed("fetch", self.session.post, self.data_url, data=data)
+        # an expired sid is answered with an error object and a non-200 status, never with an empty order list
+        return response.json() if response.status_code == 200 else None
+
+    def fetch_orders(self):
+        """
+        The raw `objednavky` response (menu and orders of the coming days) for this account.
+        """
+        try:
+            credentials = self._credentials()
+            raw_src = self._fetch(*credentials)
+            if raw_src is None:
+                with self._lock:
+                    self.stats["relogins"] += 1
+                raw_src = self._fetch(*self._credentials(rejected=credentials))
+            if raw_src is None:
+                raise StravaError("Strava rejected a fresh sid")
+        except (requests.RequestException, ValueError, StravaError):
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        with self._lock:
+            self.stats["fetches"] += 1
+        return raw_src
+
+    def get_stats(self):
+        with self._lock:
+            latencies = {kind: list(samples) for kind, samples in self._latencies.items()}
+            result = dict(self.stats)
+        for kind, samples in latencies.items():
+            result[f"{kind}_ms_p50"] = _percentile(samples, 50)
+            result[f"{kind}_ms_p95"] = _percentile(samples, 95)
+            result[f"{kind}_ms_max"] = round(max(samples), 2) if samples else 0.0
+        return result
+
+def load_accounts():
+    """
+    STRAVA_ACCOUNTS is a JSON object {"<account>": {"canteen", "username", "password", "api_key"}}.
+    The legacy CANTEEN_NUM / USERNAME / PASSWORD variables form the DEFAULT_ACCOUNT when it is not
+    listed there; the shared API_KEY always serves it, so it must exist one way or the other.
+    """
+    legacy = {"canteen": CANTEEN_NUM, "username": USERNAME, "password": PASSWORD, "api_key": None}
+    raw = os.getenv("STRAVA_ACCOUNTS")
+    if not raw:
+        return {DEFAULT_ACCOUNT: legacy}
+    accounts = json.loads(raw)
+    for name, account in accounts.items():
+        if not all(account.get(key) for key in ("canteen", "username", "password")):
+            raise ValueError(f"STRAVA_ACCOUNTS: account {name} needs canteen, username and password")
+    if DEFAULT_ACCOUNT not in accounts:
+        if not all((CANTEEN_NUM, USERNAME, PASSWORD)):
+            raise ValueError(f"STRAVA_ACCOUNTS has no {DEFAULT_ACCOUNT!r} account (STRAVA_DEFAULT_ACCOUNT) and CANTEEN_NUM / USERNAME / PASSWORD are not set")
+        accounts[DEFAULT_ACCOUNT] = legacy
+    return accounts
+
+ACCOUNTS = load_accounts()
+# one client (keep-alive session + sid) per account
+clients = {name: StravaClient(account["canteen"], account["username"], account["password"]) for name, account in ACCOUNTS.items()}
+metrics.register("strava_client", lambda: {name: client.get_stats() for name, client in clients.items()})
+
+def get_data_strava(account=DEFAULT_ACCOUNT):
+    return clients[account].fetch_orders()
 
 def get_date():
     now = datetime.now(ZoneInfo("Europe/Prague"))
     return now.strftime("%d. %m. %Y")
 
-def get_today_meal():
-    date = get_date()
-    raw_src = get_data_strava()
-    clean_src = parser(raw_src)
-    clean_src["date"] = clean_src["date"].replace(".", ". ")
+def get_iso_date():
+    return datetime.now(ZoneInfo("Europe/Prague")).strftime("%Y-%m-%d")
 
-    if not clean_src["date"] == date:
-        return {"date": date, "meal_num": "------", "meal_name": "No meal ordered."}
-    return clean_src
\ No newline at end of file
+def get_meals(account=DEFAULT_ACCOUNT):
+    return parser(get_data_strava(account))
+
+def get_today_meal(account=DEFAULT_ACCOUNT):
+    date = get_date()
+    for day in get_meals(account):
+        if day["date"] == date:
+            return day
+    return {"date": date, **NO_MEAL}
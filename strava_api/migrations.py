@@ -0,0 +1,90 @@
+from assets.migrations import Migration
+from datetime import datetime
+import os
+
+def backfill_days(conn):
+    # cached_meals.date is the display form "18. 10. 2026"
+    for row in conn.execute("SELECT date FROM cached_meals WHERE day IS NULL").fetchall():
+        try:
+            day = datetime.strptime(row["date"].replace(" ", ""), "%d.%m.%Y").strftime("%Y-%m-%d")
+        except ValueError:
+            continue
+        conn.execute("UPDATE cached_meals SET day = ?, menu = '[]' WHERE date = ?", (day, row["date"]))
+
+def copy_meals_to_default_account(conn):
+    # the rows cached so far belong to the account the shared API_KEY serves (strava_api.main.DEFAULT_ACCOUNT)
+    conn.execute(
+        "INSERT INTO cached_meals_by_account (account, date, day, meal_num, meal_name, menu, fetched_at) SELECT ?, date, day, meal_num, meal_name, menu, fetched_at FROM cached_meals",
+        (os.getenv("STRAVA_DEFAULT_ACCOUNT", "default"),)
+    )
+
+MIGRATIONS = [
+    Migration(1, "baseline schema", [
+        """
+        CREATE TABLE IF NOT EXISTS cached_meals (
+            date TEXT PRIMARY KEY,
+            meal_num TEXT NOT NULL,
+            meal_name TEXT NOT NULL
+        )
+        """
+    ]),
+    Migration(2, "whole order horizon with menus", [
+        "ALTER TABLE cached_meals ADD COLUMN day TEXT",
+        # JSON array of {"meal_num", "meal_name", "ordered"}: everything offered that day
+        "ALTER TABLE cached_meals ADD COLUMN menu TEXT",
+        "ALTER TABLE cached_meals ADD COLUMN fetched_at INTEGER",
+        backfill_days,
+        # get-meals: WHERE day BETWEEN ? AND ?
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_cached_meals_day ON cached_meals (day)"
+    ]),
+    Migration(3, "leases for single-flight upstream fetches", [
+        # assets/leases.py: one row per held lease, e.g. "strava_meals:18. 10. 2026"
+        """
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires REAL NOT NULL
+        )
+        """
+    ]),
+    Migration(4, "status of scheduled cache pre-warming", [
+        # assets/prewarm.py: last outcome per job, shared by all workers for /metrics
+        """
+        CREATE TABLE IF NOT EXISTS prewarm_status (
+            job TEXT PRIMARY KEY,
+            last_success REAL,
+            last_failure REAL,
+            last_error TEXT
+        )
+        """
+    ]),
+    Migration(5, "cache meals per Strava account", [
+        # SQLite cannot change a primary key in place: rebuild as (account, date)
+        """
+        CREATE TABLE cached_meals_by_account (
+            account TEXT NOT NULL,
+            date TEXT NOT NULL,
+            day TEXT,
+            meal_num TEXT NOT NULL,
+            meal_name TEXT NOT NULL,
+            menu TEXT,
+            fetched_at INTEGER,
+            PRIMARY KEY (account, date)
+        )
+        """,
+        copy_meals_to_default_account,
+        "DROP TABLE cached_meals",
+        "ALTER TABLE cached_meals_by_account RENAME TO cached_meals",
+        # get-meals: WHERE account = ? AND day BETWEEN ? AND ?
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_cached_meals_account_day ON cached_meals (account, day)",
+        # per-account budget of upstream fetches, shared by all workers (assets/rate_limit.consume_shared)
+        """
+        CREATE TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            expiry REAL NOT NULL
+        )
+        """
+    ])
+]
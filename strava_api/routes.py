@@ -1,47 +1,201 @@
 from flask import Blueprint, request, jsonify, current_app
 from dotenv import load_dotenv
-from strava_api.main import get_today_meal, get_date
-import os, sqlite3
+from assets import global_modules, leases, metrics, rate_limit
+from strava_api.main import get_meals, get_date, get_iso_date, NO_MEAL, ACCOUNTS, DEFAULT_ACCOUNT
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as Date
+import os, sqlite3, json, time, math
 
 strava_api_bp = Blueprint("strava_api", __name__)
 load_dotenv(override=True)
 EXPECTED_API_KEY = os.getenv("API_KEY")
 if not EXPECTED_API_KEY:
     raise ValueError("API_KEY not found in environment variables")
-db_path = os.path.join(os.path.dirname(__file__), "strava_api_cache.db")
+
+# longest range one get-meals call may ask for
+MEALS_MAX_DAYS = 62
+# how long one worker may hold the refresh of a day before another takes over
+STRAVA_LEASE_TTL_SEC = int(os.getenv("STRAVA_LEASE_TTL_SEC", "30"))
+# Europe/Prague wall-clock times at which the order horizon is refreshed ahead of the first caller
+PREWARM_TIMES = os.getenv("STRAVA_PREWARM_TIMES", "05:30")
+# upstream fetches per account, "<burst>/<seconds>", counted across all workers
+STRAVA_ACCOUNT_LIMIT = rate_limit.parse_limit(os.getenv("STRAVA_ACCOUNT_LIMIT", "6/60"))
+# accounts fetched at once when warming all of them
+STRAVA_REFRESH_WORKERS = int(os.getenv("STRAVA_REFRESH_WORKERS", "4"))
+# accounts refreshed this recently are skipped by a warming retry
+STRAVA_WARM_FRESH_SEC = 300
+
+# API key -> account; the shared API_KEY keeps serving the default account (load_accounts guarantees it exists)
+ACCOUNT_KEYS = {account["api_key"]: name for name, account in ACCOUNTS.items() if account.get("api_key")}
+ACCOUNT_KEYS[EXPECTED_API_KEY] = DEFAULT_ACCOUNT
+
+UPSERT_MEAL_QUERY = """
+    INSERT INTO cached_meals (account, date, day, meal_num, meal_name, menu, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (account, date) DO UPDATE SET day = excluded.day, meal_num = excluded.meal_num, meal_name = excluded.meal_name,
+        menu = excluded.menu, fetched_at = excluded.fetched_at
+"""
+
+class UpstreamBusy(Exception):
+    """
+    The account has used up its budget of upstream fetches; `retry_after` is in seconds.
+    """
+    def __init__(self, account, retry_after):
+        super().__init__(f"Strava fetch budget of {account} used up")
+        self.retry_after = retry_after
+
+# concurrent cache misses (midnight, right after a deploy) share one login + fetch
+flight = leases.SingleFlight(lease_ttl=STRAVA_LEASE_TTL_SEC)
+metrics.register("strava_single_flight", flight.get_stats)
 
 def get_db():
-    conn = sqlite3.connect(db_path, timeout=5)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return global_modules.get_db("strava_api")
+
+def account_for_key(api_key):
+    return ACCOUNT_KEYS.get(api_key) if api_key else None
+
+def cached_meal(c, account, date):
+    c.execute("SELECT date, meal_num, meal_name FROM cached_meals WHERE account = ? AND date = ?", (account, date))
+    row = c.fetchone()
+    return dict(row) if row else None
+
+def take_fetch_budget(conn, account):
+    # commits on conn, so call it before writing anything
+    retry_after = rate_limit.consume_shared(conn, f"strava:{account}", *STRAVA_ACCOUNT_LIMIT)
+    if retry_after:
+        raise UpstreamBusy(account, retry_after)
+
+def store_meals(c, account, days):
+    """
+    Upserts every fetched day of `account` into cached_meals (the caller commits). Today is always
+    written, as "No meal ordered." if Strava did not return it. Returns today's row.
+    """
+    today = get_date()
+    if not any(day["date"] == today for day in days):
+        days.append({"date": today, "day": get_iso_date(), **NO_MEAL, "menu": []})
+    now = int(time.time())
+    c.executemany(UPSERT_MEAL_QUERY, [
+        (account, day["date"], day["day"], day["meal_num"], day["meal_name"], json.dumps(day["menu"], ensure_ascii=False), now)
+        for day in days
+    ])
+    return next(day for day in days if day["date"] == today)
+
+def refresh_meals(conn, account):
+    """
+    Fetches the whole order horizon of `account` from Strava and stores it (the caller commits).
+    """
+    take_fetch_budget(conn, account)
+    return store_meals(conn.cursor(), account, get_meals(account))
+
+def warm_cache(conn):
+    """
+    Scheduled by assets/prewarm.py: refreshes every account (even when cached, orders may have changed),
+    STRAVA_REFRESH_WORKERS at a time. Accounts refreshed by an earlier attempt are skipped on retries,
+    and so are accounts whose fetch budget is used up; both kinds of misses are raised after the rest is stored.
+    """
+    c = conn.cursor()
+    today = get_date()
+    pending = []
+    busy = []
+    for account in ACCOUNTS:
+        c.execute("SELECT fetched_at FROM cached_meals WHERE account = ? AND date = ?", (account, today))
+        row = c.fetchone()
+        if row and (row["fetched_at"] or 0) >= time.time() - STRAVA_WARM_FRESH_SEC:
+            continue
+        try:
+            take_fetch_budget(conn, account)
+            pending.append(account)
+        except UpstreamBusy:
+            busy.append(account)
+
+    def fetch(account):
+        try:
+            return get_meals(account)
+        except Exception as e:
+            return e
+
+    results = {}
+    if pending:
+        # only the HTTP round trips run in the pool; the results are written here in one transaction
+        with ThreadPoolExecutor(max_workers=min(STRAVA_REFRESH_WORKERS, len(pending)), thread_name_prefix="strava-warm") as pool:
+            results = dict(zip(pending, pool.map(fetch, pending)))
+    failed = [account for account, days in results.items() if isinstance(days, Exception)]
+    for account, days in results.items():
+        if account not in failed:
+            store_meals(c, account, days)
+    conn.commit()
+    problems = [f"failed for {account}: {results[account]}" for account in failed]
+    problems += [f"fetch budget of {account} used up" for account in busy]
+    if problems:
+        raise RuntimeError(f"Strava refresh incomplete: {'; '.join(problems)}")
+
+def parse_iso_date(raw):
+    try:
+        return Date.fromisoformat(raw)
+    except ValueError:
+        return None
 
 @strava_api_bp.route("/get-today-meal", methods=["GET"])
 def get_meal():
-    # API Key validation
-    api_key = request.headers.get("x-api-key")
-    if api_key != EXPECTED_API_KEY:
+    # API Key validation; the key also selects the account
+    account = account_for_key(request.headers.get("x-api-key"))
+    if not account:
         return jsonify({"error": "Unauthorized"}), 401
+    date = get_date()
     conn = get_db()
     try:
         c = conn.cursor()
-        c.execute("SELECT * FROM cached_meals WHERE date = ?", (get_date(),))
-        row = c.fetchone()
-        if row:
+        meal_data = cached_meal(c, account, date)
+        if meal_data:
             current_app.logger.info("Cache hit - returning cached meal data")
-            return jsonify({
-                "date": row["date"],
-                "meal_num": row["meal_num"],
-                "meal_name": row["meal_name"]
-            })
-        else:
-            current_app.logger.info("Cache miss - fetching new meal data")
-            meal_data = get_today_meal()
-            c.execute("INSERT INTO cached_meals (date, meal_num, meal_name) VALUES (?, ?, ?)", (meal_data["date"], meal_data["meal_num"], meal_data["meal_name"]))
+            return jsonify(meal_data)
+
+        def fetch():
+            meal = refresh_meals(conn, account)
             conn.commit()
+            return {"date": meal["date"], "meal_num": meal["meal_num"], "meal_name": meal["meal_name"]}
+
+        current_app.logger.info(f"Cache miss - fetching the order horizon of {account}")
+        meal_data = flight.do(conn, f"strava_meals:{account}:{date}", fetch, lambda: cached_meal(c, account, date))
         return jsonify(meal_data)
+    except leases.LeaseBusy:
+        current_app.logger.warning("Meal refresh still in progress in another worker")
+        return jsonify({"error": "Meal data is being refreshed, try again shortly."}), 503
+    except UpstreamBusy as e:
+        current_app.logger.warning(str(e))
+        response = jsonify({"error": "Meal data is temporarily unavailable, try again shortly."})
+        response.headers["Retry-After"] = str(max(1, math.ceil(e.retry_after)))
+        return response, 503
     except Exception as e:
         conn.rollback()
         current_app.logger.error(f"Database error: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+@strava_api_bp.route("/get-meals", methods=["GET"])
+def get_meals_range():
+    # API Key validation; the key also selects the account
+    account = account_for_key(request.headers.get("x-api-key"))
+    if not account:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    # from / to are ISO dates, both inclusive; a missing from means today, a missing to means from
+    start = parse_iso_date(request.args.get("from", "").strip() or get_iso_date())
+    end = parse_iso_date(request.args.get("to", "").strip()) if request.args.get("to", "").strip() else start
+    if not start or not end or end < start or (end - start).days >= MEALS_MAX_DAYS:
+        return jsonify({"error": f"Invalid date range (ISO dates, at most {MEALS_MAX_DAYS} days)."}), 400
+
+    # served from the cache only; days Strava has not returned yet are simply absent
+    conn = get_db()
+    try:
+        c = conn.cursor()
+        c.execute(
+            "SELECT date, day, meal_num, meal_name, menu FROM cached_meals WHERE account = ? AND day BETWEEN ? AND ? ORDER BY day",
+            (account, start.isoformat(), end.isoformat())
+        )
+        return jsonify([dict(row, menu=json.loads(row["menu"] or "[]")) for row in c.fetchall()])
+    except Exception as e:
+        current_app.logger.error(f"Database error: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+    finally:
+        conn.close()
@@ -0,0 +1,71 @@
+from assets import db as db_pool
+from assets.migrations import migrate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading, pytest
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """
+    database(name) points the connection pool at a fresh, fully migrated copy of `name` in tmp_path.
+    """
+    def make(name):
+        path = str(tmp_path / f"{name}.db")
+        monkeypatch.setitem(db_pool.DB_PATHS, name, path)
+        migrate(name, path)
+        return path
+
+    db_pool.close_all()
+    yield make
+    db_pool.close_all()
+
+class StubRequest:
+    def __init__(self, method, path, headers, body):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+class StubServer:
+    """
+    Local stand-in for an upstream HTTP server. Every request is recorded in `requests` and answered by
+    `respond(request)`, which returns (status, headers).
+    """
+    def __init__(self):
+        self.requests = []
+        self.respond = lambda request: (200, {})
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle_one(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                request = StubRequest(self.command, self.path, dict(self.headers), self.rfile.read(length) if length else b"")
+                stub.requests.append(request)
+                status, headers = stub.respond(request)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            do_GET = do_HEAD = do_POST = handle_one
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, path="/", host="127.0.0.1"):
+        return f"http://{host}:{self.port}{path}"
+
+    def paths(self):
+        return [(request.method, request.path) for request in self.requests]
+
+@pytest.fixture
+def http_stub():
+    stub = StubServer()
+    stub.thread.start()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
@@ -0,0 +1,113 @@
+from assets import global_modules
+from link_organizer import health
+import time, pytest
+
+@pytest.fixture
+def checker():
+    # the stub listens on loopback, which the checker refuses unless private addresses are allowed
+    return health.LinkHealthChecker(workers=2, timeout=(2, 2), allow_private=True)
+
+def add_link(url, uid=1):
+    conn = global_modules.get_db("link_organizer")
+    try:
+        c = conn.cursor()
+        c.execute("INSERT INTO user_items (pid, uid, type, name, link) VALUES (0, ?, 'link', 'Link', ?)", (uid, url))
+        conn.commit()
+        return c.lastrowid
+    finally:
+        conn.close()
+
+def health_row(iid):
+    conn = global_modules.get_db("link_organizer")
+    try:
+        return dict(conn.execute("SELECT * FROM link_health WHERE iid = ?", (iid,)).fetchone())
+    finally:
+        conn.close()
+
+def make_due(iid):
+    conn = global_modules.get_db("link_organizer")
+    try:
+        conn.execute("UPDATE link_health SET next_check = 0 WHERE iid = ?", (iid,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def test_head_falls_back_to_get(checker, http_stub):
+    http_stub.respond = lambda request: (405, {}) if request.method == "HEAD" else (200, {})
+    assert checker.probe(http_stub.url("/page")) == ("ok", 200)
+    assert http_stub.paths() == [("HEAD", "/page"), ("GET", "/page")]
+
+def test_broken_link_is_confirmed_with_get(checker, http_stub):
+    http_stub.respond = lambda request: (404, {})
+    assert checker.probe(http_stub.url("/gone")) == ("broken", 404)
+    assert http_stub.paths() == [("HEAD", "/gone"), ("GET", "/gone")]
+
+def test_follows_redirects_by_hand(checker, http_stub):
+    redirects = {"/old": "/moved", "/moved": http_stub.url("/new")}
+    http_stub.respond = lambda request: (301, {"Location": redirects[request.path]}) if request.path in redirects else (200, {})
+    assert checker.probe(http_stub.url("/old")) == ("ok", 200)
+    assert http_stub.paths() == [("HEAD", "/old"), ("HEAD", "/moved"), ("HEAD", "/new")]
+
+def test_redirect_loop_is_unreachable(checker, http_stub):
+    http_stub.respond = lambda request: (302, {"Location": "/loop"})
+    assert checker.probe(http_stub.url("/loop")) == ("unreachable", None)
+    assert len(http_stub.requests) == health.LINK_CHECK_MAX_REDIRECTS + 1
+
+def test_redirect_to_private_address_is_not_followed(http_stub, monkeypatch):
+    # with private addresses refused, 127.0.0.1 stands in for a public site that redirects into the LAN
+    is_public_host = health.is_public_host
+    monkeypatch.setattr(health, "is_public_host", lambda host: host == "127.0.0.1" or is_public_host(host))
+    checker = health.LinkHealthChecker(workers=2, timeout=(2, 2), allow_private=False)
+    http_stub.respond = lambda request: (302, {"Location": http_stub.url("/admin", host="localhost")}) if request.path == "/" else (200, {})
+    assert checker.probe(http_stub.url("/")) == ("unreachable", None)
+    assert http_stub.paths() == [("HEAD", "/")]
+
+def test_claim_is_compare_and_set(database, checker, http_stub):
+    database("link_organizer")
+    add_link(http_stub.url("/a"))
+    conn = global_modules.get_db("link_organizer")
+    try:
+        c = conn.cursor()
+        now = int(time.time())
+        assert len(checker._claim(c, now)) == 1
+        # the first claim pushed next_check past `now`, so no other worker takes the link
+        assert checker._claim(c, now) == []
+        conn.commit()
+    finally:
+        conn.close()
+
+def test_unreachable_backs_off_then_recovers(database, checker, http_stub):
+    database("link_organizer")
+    iid = add_link(http_stub.url("/flaky"))
+    http_stub.respond = lambda request: (503, {})
+    before = int(time.time())
+    assert checker.run_once() == {"ok": 0, "broken": 0, "unreachable": 1}
+
+    row = health_row(iid)
+    assert row["status"] == "unreachable" and row["http_code"] == 503 and row["failures"] == 1
+    # first failure: RECHECK_UNREACHABLE_BASE_SEC with +-10 % jitter
+    base = health.RECHECK_UNREACHABLE_BASE_SEC
+    assert before + base * 0.9 - 1 <= row["next_check"] <= int(time.time()) + base * 1.1
+    # nothing is due until then
+    assert checker.run_once() == {"ok": 0, "broken": 0, "unreachable": 0}
+
+    make_due(iid)
+    assert checker.run_once()["unreachable"] == 1
+    row = health_row(iid)
+    assert row["failures"] == 2
+    assert row["next_check"] >= int(time.time()) + base * 2 * 0.9 - 1
+
+    make_due(iid)
+    http_stub.respond = lambda request: (200, {})
+    assert checker.run_once() == {"ok": 1, "broken": 0, "unreachable": 0}
+    row = health_row(iid)
+    assert row["status"] == "ok" and row["failures"] == 0
+    assert row["next_check"] >= int(time.time()) + health.RECHECK_OK_SEC * 0.9 - 1
+
+def test_same_url_is_probed_once(database, checker, http_stub):
+    database("link_organizer")
+    url = http_stub.url("/shared")
+    iids = [add_link(url, uid=1), add_link(url, uid=2)]
+    assert checker.run_once() == {"ok": 2, "broken": 0, "unreachable": 0}
+    assert http_stub.paths() == [("HEAD", "/shared")]
+    assert all(health_row(iid)["status"] == "ok" for iid in iids)
@@ -0,0 +1,101 @@
+from assets import global_modules
+from auth import outbox
+import json, time, pytest
+
+@pytest.fixture
+def dispatcher(database, http_stub):
+    database("auth")
+    return outbox.OutboxDispatcher(api_url=http_stub.url("/v3/smtp/email"), api_key="test-key")
+
+def queue_email(expiry_in=300):
+    conn = global_modules.get_db("auth")
+    try:
+        c = conn.cursor()
+        outbox.enqueue(c, "user@example.com", "Your code", "<p>123456</p>", int(time.time()) + expiry_in)
+        conn.commit()
+        return c.lastrowid
+    finally:
+        conn.close()
+
+def outbox_row(email_id):
+    conn = global_modules.get_db("auth")
+    try:
+        return dict(conn.execute("SELECT * FROM email_outbox WHERE id = ?", (email_id,)).fetchone())
+    finally:
+        conn.close()
+
+def make_due(email_id):
+    conn = global_modules.get_db("auth")
+    try:
+        conn.execute("UPDATE email_outbox SET next_attempt = ? WHERE id = ?", (int(time.time()), email_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+def test_claim_is_compare_and_set(dispatcher):
+    queue_email()
+    conn = global_modules.get_db("auth")
+    try:
+        c = conn.cursor()
+        now = int(time.time())
+        assert len(dispatcher._claim(c, now)) == 1
+        # the first claim pushed next_attempt past `now`, so nobody else takes the row
+        assert dispatcher._claim(c, now) == []
+        conn.commit()
+    finally:
+        conn.close()
+
+def test_retry_with_backoff_then_send(dispatcher, http_stub):
+    email_id = queue_email()
+    http_stub.respond = lambda request: (503, {})
+    before = int(time.time())
+    assert dispatcher.run_once() == {"sent": 0, "retried": 1, "failed": 0}
+
+    row = outbox_row(email_id)
+    assert row["status"] == "pending" and row["attempts"] == 1
+    assert row["html"] == "<p>123456</p>"
+    assert row["last_error"].startswith("HTTP 503")
+    # backoff_delay(1): 4 s plus up to 50 % jitter
+    assert before + 4 <= row["next_attempt"] <= int(time.time()) + 6
+    # not due again before the backoff has passed
+    assert dispatcher.run_once() == {"sent": 0, "retried": 0, "failed": 0}
+    assert len(http_stub.requests) == 1
+
+    make_due(email_id)
+    http_stub.respond = lambda request: (201, {})
+    assert dispatcher.run_once() == {"sent": 1, "retried": 0, "failed": 0}
+
+    row = outbox_row(email_id)
+    assert row["status"] == "sent" and row["attempts"] == 2 and row["sent_at"]
+    assert row["html"] == "" and row["last_error"] is None
+
+    request = http_stub.requests[-1]
+    assert (request.method, request.path) == ("POST", "/v3/smtp/email")
+    assert request.headers["api-key"] == "test-key"
+    body = json.loads(request.body)
+    assert body["to"] == [{"email": "user@example.com"}]
+    assert body["subject"] == "Your code" and body["htmlContent"] == "<p>123456</p>"
+
+def test_client_error_fails_without_retry(dispatcher, http_stub):
+    email_id = queue_email()
+    http_stub.respond = lambda request: (400, {})
+    assert dispatcher.run_once() == {"sent": 0, "retried": 0, "failed": 1}
+    row = outbox_row(email_id)
+    assert row["status"] == "failed" and row["html"] == ""
+
+def test_gives_up_after_max_attempts(dispatcher, http_stub):
+    email_id = queue_email()
+    http_stub.respond = lambda request: (500, {})
+    for _ in range(outbox.OUTBOX_MAX_ATTEMPTS - 1):
+        assert dispatcher.run_once()["retried"] == 1
+        make_due(email_id)
+    assert dispatcher.run_once()["failed"] == 1
+    row = outbox_row(email_id)
+    assert row["status"] == "failed" and row["attempts"] == outbox.OUTBOX_MAX_ATTEMPTS and row["html"] == ""
+
+def test_expired_email_is_dropped_unsent(dispatcher, http_stub):
+    email_id = queue_email(expiry_in=-1)
+    assert dispatcher.run_once() == {"sent": 0, "retried": 0, "failed": 1}
+    assert http_stub.requests == []
+    row = outbox_row(email_id)
+    assert row["status"] == "failed" and row["html"] == ""
@@ -2,79 +2,75 @@ from flask import Blueprint, request, jsonify, make_response, current_app, abort
 import sqlite3
 import os
 import time
+from assets import global_modules, session_cache, session_tokens
 
 # set the base url
 url_base = "https://api.fedorco.dev"
 
 user_bp = Blueprint("user", __name__)
 
-# Path to SQLite database file for auth
-db_path = os.path.join(os.path.dirname(__file__), "..", "auth", "auth.db")
-db_path = os.path.abspath(db_path)
-
 def get_db():
     """
-    Connects to the SQLite database and sets row factory to access columns by name.
+    Returns this thread's pooled connection to the auth database (rows accessible by column name).
     """
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def validate_session(sid):
-    conn = get_db()
-    try:
-        c = conn.cursor()
-        c.execute("SELECT * FROM sessions WHERE sid = ?", (sid,))
-        session = c.fetchone()
-        if not session:
-            return False
-        sid_expiry = session["expiry"]
-        time_now = int(time.time())
-
-        if time_now > int(sid_expiry):
-            c.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
-            conn.commit()
-            return False
-        else:
-            return True
-    except Exception as e:
-        current_app.logger.info(f"DB error: {e}")
-        abort(500, description="Database error.")
-    finally:
-        conn.close()
+    return global_modules.get_db("auth")
 
 @user_bp.route("/getinfo", methods=["GET"])
 def getInfo():
     session_id = request.cookies.get("session")
     if not session_id:
         return jsonify({"error": "User not logged in."}), 400
-    if validate_session(session_id):
+
+    # warm path: both the session and the profile are cached -> no DB access at all
+    if session_tokens.is_token(session_id):
+        # signed tokens are verified in memory
+        user_id = global_modules.validate_session(session_id)
+        if not user_id:
+            return invalid_session_response()
+    else:
+        user_id = session_cache.sessions.get(session_id)
+    user_dict = session_cache.profiles.get(user_id) if user_id is not None else None
+
+    if user_dict is None:
         conn = get_db()
         try:
             c = conn.cursor()
-            c.execute("SELECT uid FROM sessions WHERE sid = ?", (session_id,))
-            user_id_obj = c.fetchone()
-            user_id = user_id_obj["uid"]
-            
-            c.execute("SELECT uid, email FROM users WHERE uid = ?", (user_id,))
-            user_info = c.fetchone()
-            if not user_info:
+            if user_id is None:
+                # cold path: validate the session and load the user in one indexed lookup
+                c.execute("""
+                    SELECT s.uid, s.expiry, u.email, u.password
+                    FROM sessions s LEFT JOIN users u ON u.uid = s.uid
+                    WHERE s.sid = ?
+                """, (session_id,))
+                row = c.fetchone()
+                if not row or int(time.time()) > int(row["expiry"]):
+                    return invalid_session_response()
+                user_id = int(row["uid"])
+                global_modules.cache_session(session_id, user_id, row["expiry"])
+            else:
+                c.execute("SELECT uid, email, password FROM users WHERE uid = ?", (user_id,))
+                row = c.fetchone()
+
+            if not row or row["email"] is None:
                 return jsonify({"error": "User not found."}), 404
-            user_dict = dict(user_info)
-            # check, whether the user has signed only via google to hide the "change pass" button
-            c.execute("SELECT password FROM users WHERE uid = ?", (user_id,))
-            user_info_pass = c.fetchone()[0]
-            user_dict["is_google_only"] = not bool(user_info_pass)
-            
-            response = make_response(jsonify(user_dict), 200)
+            user_dict = {
+                "uid": user_id,
+                "email": row["email"],
+                # whether the user has signed only via google to hide the "change pass" button
+                "is_google_only": not bool(row["password"])
+            }
+            session_cache.profiles.set(user_id, user_dict)
         except Exception as e:
             current_app.logger.info(f"DB error: {e}")
             return jsonify({"error": "Database error."}), 500
         finally:
             conn.close()
-    else:
-        response = make_response(jsonify({"error": "Invalid session."}), 401)
-        response.set_cookie(
+
+    return make_response(jsonify(user_dict), 200)
+
+def invalid_session_response():
+    response = make_response(jsonify({"error": "Invalid session."}), 401)
+    response.set_cookie(
         "session",
         "",
         httponly=True,
@@ -85,4 +81,4 @@ def getInfo():
         max_age=0,
         path="/"
     )
-    return response
\ No newline at end of file
+    return response